@@ -1,29 +1,37 @@
 import asyncio
 import gc
 import time
+import uuid
 import aiohttp
 import psutil
 from http import HTTPStatus
 from prometheus_client import Gauge, generate_latest
 import uvicorn
 from common import log, utils
+from common.concurrency import AdaptiveConcurrency
+from common.job import Job
 from common.enums import ContentType
 from database import mongo
+from database.sink import JobUpdateSink
 from database.dbutils import dbutils
 from datetime import datetime, timedelta, timezone
 from teleapi import endpoints as teleapi
+from teleapi import ratelimit
+from teleapi.requests import RequestResponse
 from fastapi import FastAPI, Request, Response
 from prometheus_fastapi_instrumentator import Instrumentator
-from typing import Any, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import config
 from bot import replies
 from bot.ptb import lifespan
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lambda app: lifespan(app, tick=run_tick))
 Instrumentator().instrument(app).expose(app)
 cpu_usage = Gauge("cpu_usage", "CPU Usage")
 memory_usage = Gauge("memory_usage", "Memory Usage")
+send_concurrency = Gauge("send_concurrency", "Adaptive Send Concurrency Limit")
+concurrency = AdaptiveConcurrency()  # kept across ticks so it keeps what it learnt
 IGNORED_ERRORS = {"Error 504: TimeoutError - TimeoutError()"}
 
 
@@ -32,6 +40,13 @@ def home() -> str:
     return "Hello world!"
 
 
+@app.get("/readyz")
+def readiness(request: Request) -> Response:
+    if not getattr(request.app.state, "ready", False):
+        return Response(status_code=HTTPStatus.SERVICE_UNAVAILABLE)
+    return Response(status_code=HTTPStatus.OK)
+
+
 @app.get("/metricz")
 def prom_endpoint() -> Response:
     cpu_percent = psutil.cpu_percent()
@@ -39,9 +54,10 @@ def prom_endpoint() -> Response:
 
     cpu_usage.set(cpu_percent)
     memory_usage.set(memory_percent)
+    send_concurrency.set(concurrency.width())
 
     log.logger.info(
-        f"[PROMETHEUS] Updated Prometheus, cpu_usage={cpu_percent}, memory_usage={memory_percent}"
+        f"[PROMETHEUS] Updated Prometheus, cpu_usage={cpu_percent}, memory_usage={memory_percent}, send_concurrency={concurrency.width()}"
     )
 
     return Response(content=generate_latest(), media_type="text/plain")
@@ -54,31 +70,63 @@ async def run(request: Request) -> Response:
     http_session = request.app.state.http_session
     influx_db = request.app.state.influx
 
+    try:
+        await run_tick(db_service, http_session, influx_db)
+    except Exception as e:
+        log.logger.error(f"[API] Job processing failed: {type(e).__name__} - {e}")
+        return Response(status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    return Response(status_code=HTTPStatus.OK)
+
+
+async def run_tick(
+    db_service: mongo.MongoService,
+    http_session: aiohttp.ClientSession,
+    influx_db: Any,
+) -> int:
     now = datetime.now(timezone(timedelta(hours=config.TZ_OFFSET)))
     parsed_time = utils.parse_time_mins(now)
-    entries = await dbutils.find_entries_by_nextrun(db_service, parsed_time)
 
-    entry_count = len(entries)
-    log.logger.info(
-        f"[TELEGRAM API] Processing {entry_count} message(s) to send this time..."
-    )
-
-    if entry_count < 1:
-        gc.collect()
-        return Response(status_code=HTTPStatus.OK)
+    # claim due jobs for this worker in bulk, then only process what we won
+    lease_token = uuid.uuid4().hex
+    await dbutils.claim_due_jobs(db_service, parsed_time, lease_token)
 
-    # schedule all jobs with concurrency limit
+    # stream claimed jobs into a bounded queue drained by workers, sends start
+    # with the first batch and memory stays flat however many jobs are due
     start_time = time.perf_counter()
-    sem = asyncio.Semaphore(config.BATCH_SIZE)  # concurrency limiter
-    tasks = [
-        bounded_process_job(db_service, http_session, entry, sem) for entry in entries
-    ]
-    # gather all tasks, exceptions are handled individually inside bounded_process_job
+    entry_count = 0
+    sink = JobUpdateSink(db_service)  # batches the post-send job updates
+    sink.start()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=config.TICK_QUEUE_SIZE)
+    workers: List[asyncio.Task] = []
     try:
-        await asyncio.gather(*tasks)
-    except Exception as e:
-        log.logger.error(f"[API] Job processing failed: {type(e).__name__} - {e}")
-        return Response(status_code=HTTPStatus.INTERNAL_SERVER_ERROR)
+        async for entries in dbutils.iter_entries_by_lease(db_service, lease_token):
+            log.logger.info(
+                f"[TELEGRAM API] Processing {len(entries)} message(s) to send this time..."
+            )
+            entry_count += len(entries)
+            while len(workers) < min(entry_count, config.TICK_WORKERS):
+                workers.append(
+                    asyncio.create_task(
+                        job_worker(db_service, http_session, sink, queue)
+                    )
+                )
+
+            jobs = [Job.from_entry(entry) for entry in entries]
+            next_runs = await get_next_runs(db_service, jobs)
+            for job in jobs:
+                await queue.put((job, next_runs))
+        await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await sink.close()
+
+    if entry_count < 1:
+        log.logger.info("[TELEGRAM API] Processing 0 message(s) to send this time...")
+        gc.collect()
+        return 0
 
     end_time = time.perf_counter()
 
@@ -91,174 +139,218 @@ async def run(request: Request) -> Response:
         f"[TELEGRAM API] Finished processing {entry_count} messages in {end_time - start_time:.2f} seconds"
     )
 
-    return Response(status_code=HTTPStatus.OK)
+    return entry_count
+
+
+async def get_next_runs(
+    db_service: mongo.MongoService, jobs: List[Job]
+) -> Dict[Any, Optional[Tuple[str, str]]]:
+    # jobs carry their own timezone, only jobs created before that need chat_data
+    chat_ids = [job.target_chat_id for job in jobs if job.utc_tz is None]
+    chats = {}
+    if len(chat_ids) > 0:
+        chats = await dbutils.find_chats_tz_by_chatids(db_service, chat_ids)
+    # next runs for the whole batch in one go instead of once per job
+    schedules = [(job.crontab, *get_job_timezone(job, chats)) for job in jobs]
+    return dict(zip((job.id for job in jobs), utils.calc_next_runs(schedules)))
+
+
+async def job_worker(
+    db_service: mongo.MongoService,
+    http_session: aiohttp.ClientSession,
+    sink: JobUpdateSink,
+    queue: asyncio.Queue,
+) -> None:
+    while True:
+        job, next_runs = await queue.get()
+        try:
+            await bounded_process_job(
+                db_service, http_session, sink, next_runs, job, concurrency
+            )
+        finally:
+            queue.task_done()
 
 
 async def bounded_process_job(
     db_service: mongo.MongoService,
     http_session: aiohttp.ClientSession,
-    entry: Optional[Any],
-    sem: asyncio.Semaphore,
+    sink: JobUpdateSink,
+    next_runs: Dict[Any, Optional[Tuple[str, str]]],
+    job: Job,
+    limiter: AdaptiveConcurrency,
 ):
     try:
-        # Acquire semaphore safely
-        async with sem:
-            await process_job(db_service, http_session, entry)
+        for attempt in range(config.SEND_RETRY_ATTEMPTS + 1):
+            async with limiter:
+                start_time = time.perf_counter()
+                retry_in = await process_job(
+                    db_service, http_session, sink, next_runs, job, attempt
+                )
+                limiter.record(time.perf_counter() - start_time, retry_in is not None)
+            if retry_in is None:
+                return
+            # wait outside the limiter so other jobs keep sending meanwhile
+            log.logger.info(
+                f"[TELEGRAM API] Retrying job in {retry_in:.1f}s, job_id={job.id}, attempt={attempt + 1}"
+            )
+            await asyncio.sleep(retry_in)
     except Exception as e:
         log.logger.error(
-            f"[TELEGRAM API] Job {entry.get('_id')} failed: {type(e).__name__} - {repr(e)}"
+            f"[TELEGRAM API] Job {job.id} failed: {type(e).__name__} - {repr(e)}"
         )
 
 
 async def process_job(
     db_service: mongo.MongoService,
     http_session: aiohttp.ClientSession,
-    entry: Optional[Any],
-) -> None:
-    if entry is None:
-        log.logger.warning("[TELEGRAM API] Skipping empty entry")
-        return
-
+    sink: JobUpdateSink,
+    next_runs: Dict[Any, Optional[Tuple[str, str]]],
+    job: Job,
+    attempt: int = 0,
+) -> Optional[float]:
+    """Returns the delay to retry the job after within this tick, if any."""
     now = utils.now()
-
-    job_id = entry["_id"]
-    channel_id = entry.get("channel_id") or ""
-    chat_id = entry.get("chat_id") or ""
-    if channel_id is not None and channel_id != "":
-        chat_id = channel_id
-    content = entry.get("content") or ""
-    content_type = entry.get("content_type") or ""
-    photo_id = entry.get("photo_id") or ""
-    photo_group_id = str(entry.get("photo_group_id") or "")
-    crontab = entry.get("crontab") or ""
-    previous_message_id = str(entry.get("previous_message_id") or "")
-    message_thread_id = entry.get("message_thread_id", None)
-    db_nextrun_ts = entry.get("nextrun_ts") or ""
-    user_nextrun_ts = entry.get("user_nextrun_ts") or ""
-    errors = entry.get("errors", [])
-    option_delete_previous = entry.get("option_delete_previous") or ""
-
-    user_bot_token = entry.get("user_bot_token")
-    if user_bot_token is None:
-        user_bot_token = config.TELEGRAM_BOT_TOKEN
-
-    payload = {"pending_ts": now}
-    res = await dbutils.update_entry_by_jobname(
-        db_service, entry, payload, q=dbutils.make_due_jobs_query(now)
-    )
-
-    if getattr(res, "modified_count", 0) <= 0:
-        log.logger.info(
-            f'[TELEGRAM API] Job likely being processed by another worker, job_id="{job_id}", chat_id={chat_id}'
-        )
-        return
+    db_nextrun_ts, user_nextrun_ts = job.nextrun_ts, job.user_nextrun_ts
+    errors = list(job.errors)
 
     # process messages
-    bot_message_id, err = await send_message(
-        http_session,
-        job_id,
-        chat_id,
-        content,
-        content_type,
-        photo_id,
-        photo_group_id,
-        user_bot_token,
-        message_thread_id,
+    bot_message_id, err, retry_after, new_photo_id = await send_message(
+        http_session, job
     )
 
+    # rate limits and transient failures are retried in this tick, the job stays
+    # leased in the meantime
+    if retry_after is not None and attempt < config.SEND_RETRY_ATTEMPTS:
+        retry_in = max(retry_after, config.SEND_RETRY_BACKOFF * 2**attempt)
+        if retry_in <= config.SEND_RETRY_MAX_DELAY:
+            return retry_in
+
     if err is None:
-        if option_delete_previous != "" and previous_message_id != "":
+        if job.option_delete_previous != "" and len(job.previous_message_ids) > 0:
             await teleapi.delete_message(
-                http_session, chat_id, previous_message_id, user_bot_token
+                http_session,
+                job.target_chat_id,
+                job.previous_message_id,
+                job.bot_token,
             )
 
-        # calculate and update next run time
-        chat_entry = await dbutils.find_chat_by_chatid(db_service, chat_id) or {}
-        user_tz_offset = chat_entry.get("tz_offset", config.TZ_OFFSET)
-        user_timezone = chat_entry.get("utc_tz")
-        user_nextrun_ts, db_nextrun_ts = utils.calc_next_run(
-            crontab, user_timezone, user_tz_offset
-        )
+        # next runs are calculated per batch in run_tick, invalid crontabs raise here
+        next_run = next_runs.get(job.id)
+        if next_run is None:
+            user_timezone, user_tz_offset = get_job_timezone(job, {})
+            next_run = utils.calc_next_run(job.crontab, user_timezone, user_tz_offset)
+        user_nextrun_ts, db_nextrun_ts = next_run
         errors = []
     else:
-        if err not in IGNORED_ERRORS:
+        # being rate limited is not the job's fault, nextrun is kept so the next
+        # tick sends it again
+        rate_limited = retry_after is not None and retry_after > 0
+        if err not in IGNORED_ERRORS and not rate_limited:
             errors = [*errors, {"error": err, "timestamp": now}]
-        bot_message_id = previous_message_id
+        bot_message_id = job.previous_message_id
 
     should_remove = len(errors) > config.RETRIES
     if should_remove:
-        await notify_job_deleted(
-            http_session=http_session,
-            entry=entry,
-            errors=errors,
-            user_bot_token=user_bot_token,
-        )
+        await notify_job_deleted(http_session=http_session, job=job, errors=errors)
 
     payload = {
-        "pending_ts": None,
+        "pending_ts": "",
+        "lease_token": "",
         "nextrun_ts": db_nextrun_ts,
+        "nextrun_min": utils.ts_to_epoch_mins(db_nextrun_ts),
         "user_nextrun_ts": user_nextrun_ts,
         "previous_message_id": str(bot_message_id),
         "removed_ts": now if should_remove else "",
         "errors": errors,
     }
-    await dbutils.update_entry_by_jobname(db_service, entry, payload)
+    if new_photo_id is not None:
+        payload["photo_id"] = new_photo_id
+    # only release the job if our lease has not expired and been taken over
+    await sink.add(job.id, payload, q={"lease_token": job.lease_token})
+    return None
+
+
+def get_job_timezone(job: Job, chats: Dict[float, Any]) -> Tuple[str, float]:
+    # jobs carry their own timezone, older jobs fall back to their chat's
+    if job.utc_tz is not None:
+        tz_offset = job.tz_offset if job.tz_offset is not None else config.TZ_OFFSET
+        return job.utc_tz, tz_offset
+    chat_entry = {}
+    if job.target_chat_id != "":
+        chat_entry = chats.get(float(job.target_chat_id)) or {}
+    return chat_entry.get("utc_tz"), chat_entry.get("tz_offset", config.TZ_OFFSET)
 
 
 async def notify_job_deleted(
-    http_session: aiohttp.ClientSession,
-    entry: Optional[Any],
-    errors: list[Any],
-    user_bot_token: str,
+    http_session: aiohttp.ClientSession, job: Job, errors: list[Any]
 ) -> None:
-    if entry is None:
-        return
-
-    created_by = entry.get("created_by")
-    if created_by in (None, ""):
+    if job.created_by in (None, ""):
         log.logger.warning(
-            f'[TELEGRAM API] Failed to notify deleted job creator, job_id="{entry.get("_id")}", err=missing created_by'
+            f'[TELEGRAM API] Failed to notify deleted job creator, job_id="{job.id}", err=missing created_by'
         )
         return
 
-    message = replies.format_deleted_job_message(entry, config.RETRIES, errors)
+    message = replies.format_deleted_job_message(job, config.RETRIES, errors)
     _, err = await teleapi.send_text(
-        http_session, created_by, message, user_bot_token, None
+        http_session, job.created_by, message, job.bot_token, None
     )
     if err is not None:
         log.logger.warning(
-            f'[TELEGRAM API] Failed to notify deleted job creator, job_id="{entry.get("_id")}", user_id={created_by}, err={err}'
+            f'[TELEGRAM API] Failed to notify deleted job creator, job_id="{job.id}", user_id={job.created_by}, err={err}'
         )
 
 
 async def send_message(
-    http_session: aiohttp.ClientSession,
-    job_id: int,
-    chat_id: int,
-    content: str,
-    content_type: str,
-    photo_id: str,
-    photo_group_id: str,
-    user_bot_token: str,
-    message_thread_id: int,
-) -> Tuple[str, Optional[str]]:
+    http_session: aiohttp.ClientSession, job: Job
+) -> Tuple[str, Optional[str], Optional[float], Optional[str]]:
+    """Returns (message_id, err, retry_after, photo_id). retry_after is None if
+    retrying will not help, Telegram's retry_after for 429s and 0 for transient
+    errors. photo_id is set to the new file_ids when a media group was uploaded."""
     err = None
+    new_photo_id = None
+    chat_id = job.target_chat_id
 
-    if photo_group_id != "":  # media group
+    if job.photo_group_id != "":  # media group
         resp, err = await teleapi.send_media_group(
-            http_session, chat_id, photo_id, content, user_bot_token, message_thread_id
+            http_session,
+            chat_id,
+            job.photo_id,
+            job.content,
+            job.bot_token,
+            job.message_thread_id,
         )
-    elif photo_id != "":  # single photo
+        # photos added through another bot are uploaded once, after which the
+        # job keeps this bot's own file_ids
+        if err is None and teleapi.is_wrong_file_identifier(resp):
+            log.logger.info(
+                f'[TELEGRAM API] Uploading media group, job_id="{job.id}", chat_id={chat_id}'
+            )
+            resp, err = await teleapi.upload_media_group(
+                http_session,
+                chat_id,
+                job.photo_id,
+                job.content,
+                job.bot_token,
+                job.message_thread_id,
+            )
+            if err is None and resp.status == 200:
+                new_photo_id = teleapi.get_photo_ids(resp) or None
+    elif len(job.photo_ids) > 0:  # single photo
         resp, err = await teleapi.send_single_photo(
-            http_session, chat_id, photo_id, content, user_bot_token, message_thread_id
+            http_session,
+            chat_id,
+            job.photo_id,
+            job.content,
+            job.bot_token,
+            job.message_thread_id,
         )
-    elif content_type == ContentType.POLL.value:
+    elif job.content_type == ContentType.POLL.value:
         resp, err = await teleapi.send_poll(
-            http_session, chat_id, content, user_bot_token, message_thread_id
+            http_session, chat_id, job.content, job.bot_token, job.message_thread_id
         )
     else:  # text message
         resp, err = await teleapi.send_text(
-            http_session, chat_id, content, user_bot_token, message_thread_id
+            http_session, chat_id, job.content, job.bot_token, job.message_thread_id
         )
 
     if err is not None or resp.status != 200:
@@ -266,24 +358,36 @@ async def send_message(
             err = resp.json.get("description") or "Unknown error"
         err = f"Error {resp.status}: {err}"
         log.logger.warning(
-            f'[TELEGRAM API] Failed to send message, job_id="{job_id}", chat_id={chat_id}, status={resp.status}, err={err}'
+            f'[TELEGRAM API] Failed to send message, job_id="{job.id}", chat_id={chat_id}, status={resp.status}, err={err}'
         )
-        return "", err
+        return "", err, get_retry_after(resp, job.bot_token), None
 
     log.logger.info(
-        f'[TELEGRAM API] Sent message, job_id="{job_id}", chat_id={chat_id}, response_status={resp.status}'
+        f'[TELEGRAM API] Sent message, job_id="{job.id}", chat_id={chat_id}, response_status={resp.status}'
     )
 
-    if photo_group_id != "":
+    if job.photo_group_id != "":
         msg_ids = [
             str(message.get("message_id"))
             for message in resp.json.get("result", [])
             if isinstance(message, dict) and message.get("message_id") is not None
         ]
-        return ";".join(msg_ids), None
+        return ";".join(msg_ids), None, None, new_photo_id
 
     message_id = resp.json.get("result", {}).get("message_id") or ""
-    return message_id, None
+    return message_id, None, None, None
+
+
+def get_retry_after(resp: RequestResponse, user_bot_token: str) -> Optional[float]:
+    if resp.status == HTTPStatus.TOO_MANY_REQUESTS:
+        parameters = resp.json.get("parameters") or {}
+        retry_after = float(parameters.get("retry_after") or 1)
+        # hold back every send from this bot, not just this job
+        ratelimit.limiter.penalize(user_bot_token, retry_after)
+        return retry_after
+    if resp.status >= 500:  # includes timeouts and connection errors
+        return 0
+    return None
 
 
 # Run api only
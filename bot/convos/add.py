@@ -206,6 +206,8 @@ async def add_crontab(
         user_nextrun_ts=user_nextrun_ts,
         user_bot_token=user_bot_token,
         message_thread_id=payload.get("message_thread_id", None),
+        tz_offset=user_tz_offset,
+        utc_tz=user_timezone,
     )
 
     if result is None:
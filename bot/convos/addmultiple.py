@@ -80,6 +80,8 @@ async def add_jobs(
             user_nextrun_ts=user_nextrun,
             user_bot_token=chat_entry.get("user_bot_token"),
             message_thread_id=msg.message_thread_id if msg.is_topic_message else None,
+            tz_offset=user_tz_offset,
+            utc_tz=user_timezone,
         )
         if res is not None:
             successful_creation.append("%s: (%s) %s" % (jobname, crontab, text_content))
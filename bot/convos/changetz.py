@@ -64,6 +64,8 @@ async def update_timezone(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             db_service, user_id, tz_offset, "channel", utc_tz=timezone
         )
 
+    await dbutils.update_entries_tz_by_chatid(db_service, chat_id, tz_offset, timezone)
+
     # update job entries
     job_entries = await dbutils.find_entries_by_chatid(db_service, chat_id)
     for job_entry in job_entries:
@@ -73,7 +75,11 @@ async def update_timezone(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         user_nextrun_ts, db_nextrun_ts = utils.calc_next_run(
             crontab, timezone, tz_offset
         )
-        payload = {"nextrun_ts": db_nextrun_ts, "user_nextrun_ts": user_nextrun_ts}
+        payload = {
+            "nextrun_ts": db_nextrun_ts,
+            "nextrun_min": utils.ts_to_epoch_mins(db_nextrun_ts),
+            "user_nextrun_ts": user_nextrun_ts,
+        }
         res = await dbutils.update_entry_by_jobname(db_service, job_entry, payload)
         if res.modified_count <= 0:
             log.logger.error(
@@ -2,6 +2,7 @@ from typing import Optional
 from telegram.ext._contexttypes import ContextTypes
 from bot.convos import convo
 from bot import replies
+from common import cron
 from telegram import Update
 from cron_descriptor import get_description
 from telegram.ext import ConversationHandler
@@ -24,7 +25,11 @@ async def decrypt_cron(update: Update, _: ContextTypes) -> Optional[int]:
 
     try:
         description = get_description(update.message.text).lower()
-    except Exception:  # crontab is not valid
+        valid = cron.is_valid(update.message.text)
+    except Exception:
+        valid = False
+
+    if not valid:  # crontab is not valid
         await replies.text(
             update, replies.checkcron_invalid_message, reply_markup=replies.force_reply
         )
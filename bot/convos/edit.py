@@ -170,6 +170,7 @@ async def toggle_pause_job(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             return ConversationHandler.END
         payload = {
             "nextrun_ts": crontab_payload["nextrun_ts"],
+            "nextrun_min": crontab_payload["nextrun_min"],
             "user_nextrun_ts": crontab_payload["user_nextrun_ts"],
             **payload,
         }
@@ -382,6 +383,7 @@ async def prepare_crontab_update(
     payload = {
         "crontab": crontab,
         "nextrun_ts": db_nextrun_ts,
+        "nextrun_min": utils.ts_to_epoch_mins(db_nextrun_ts),
         "user_nextrun_ts": user_nextrun_ts,
         "last_updated_by": update.message.from_user.id,
     }
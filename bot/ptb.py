@@ -1,22 +1,49 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
-import aiohttp
+from functools import partial
 from fastapi import FastAPI
 from influxdb_client_3 import InfluxDBClient3
 import config
 from telegram.ext import Application
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional
 from bot.handlers import bot_handlers, handle_error
 
 from common import log
-from database import mongo
+from common.scheduler import TickScheduler
+from database import migrations, mongo
+from pymongo.errors import PyMongoError
+from teleapi import session
+
+
+async def warm_up(db_service: mongo.MongoService, http_session: Any) -> None:
+    start = time.monotonic()
+    try:
+        _, connections = await asyncio.gather(
+            db_service.ping(),
+            session.warm_up(http_session, config.WARMUP_HTTP_CONNECTIONS),
+        )
+    except PyMongoError as e:
+        log.logger.warning(f"[DB] Warm-up ping failed: {type(e).__name__} - {e}")
+        return
+    log.logger.info(
+        f"[BOT] Warmed up connections, telegram_connections={connections}, duration={time.monotonic() - start:.2f}"
+    )
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI) -> AsyncGenerator:
-    db_service = mongo.MongoService(config.MONGODB_CONNECTION_STRING)
+async def lifespan(
+    app: FastAPI, tick: Optional[Callable[..., Awaitable[Any]]] = None
+) -> AsyncGenerator:
+    app.state.ready = False
+    db_service = mongo.MongoService(
+        config.MONGODB_CONNECTION_STRING, config.MONGODB_MIN_POOL_SIZE
+    )
     app.state.mongo = db_service
+    if config.RUN_MIGRATIONS_ON_STARTUP:
+        await migrations.run(db_service)
 
-    http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    http_session = session.create_session()
     app.state.http_session = http_session
 
     app.state.influx = InfluxDBClient3(
@@ -26,6 +53,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
         database=config.INFLUXDB_BUCKET,
     )
 
+    if config.WARMUP_ON_STARTUP:
+        await warm_up(db_service, http_session)
+
     # https://github.com/python-telegram-bot/python-telegram-bot/wiki/Handling-network-errors
     ptb = (
         Application.builder()
@@ -46,6 +76,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     for h in bot_handlers:
         ptb.add_handler(h)
 
+    # in-process scheduler, replaces the external cron hitting /api
+    scheduler = None
+    if config.SCHEDULER_ENABLED and tick is None:
+        log.logger.warning(
+            "[SCHEDULER] SCHEDULER_ENABLED is set but no tick was given to lifespan"
+        )
+    elif config.SCHEDULER_ENABLED:
+        scheduler = TickScheduler(
+            partial(tick, db_service, http_session, app.state.influx)
+        )
+        scheduler.start()
+
     # polling
     if config.BOTHOST is None:
         try:
@@ -55,8 +97,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
             await ptb.bot.deleteWebhook(drop_pending_updates=False)
             await ptb.start()
             await ptb.updater.start_polling(drop_pending_updates=False)
+            app.state.ready = True
             yield
         finally:
+            app.state.ready = False
+            if scheduler is not None:
+                await scheduler.stop()
             await ptb.updater.stop()
             await ptb.stop()
             await ptb.shutdown()
@@ -68,8 +114,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     try:
         log.logger.info(f"[BOT] Setting webhook, url={config.BOTHOST}")
         await ptb.bot.setWebhook(config.BOTHOST)
+        app.state.ready = True
         yield
     finally:
+        app.state.ready = False
+        if scheduler is not None:
+            await scheduler.stop()
         await ptb.shutdown()
         await http_session.close()
         db_service.disconnect()
@@ -14,6 +14,7 @@ from telegram import (
 from bot.convos import edit
 from common import log
 from common.enums import ContentType
+from common.job import Job
 from typing import Any, Dict, List, Optional, Sequence, Union
 from telegram import KeyboardButton
 from config import JOB_LIMIT_PER_PERSON
@@ -193,13 +194,8 @@ def format_exceed_limit_reply(limit: int) -> str:
     return exceed_limit_error_message.format(custom_message=msg, limit=limit)
 
 
-def format_deleted_job_message(entry: Any, retry_count: int, errors: List[Any]) -> str:
-    content = entry.get("content") or ""
-    content_type = entry.get("content_type") or ""
-    photo_id = entry.get("photo_id") or ""
-    photo_group_id = entry.get("photo_group_id") or ""
-    message_thread_id = entry.get("message_thread_id")
-    channel_id = entry.get("channel_id") or ""
+def format_deleted_job_message(job: Job, retry_count: int, errors: List[Any]) -> str:
+    message_thread_id = job.message_thread_id
     lines = [
         (
             f"Your cron job failed more than {retry_count} time(s) and has now been "
@@ -207,17 +203,17 @@ def format_deleted_job_message(entry: Any, retry_count: int, errors: List[Any])
         ),
         "",
         "Job details:",
-        f"jobname: {entry.get('jobname') or ''}",
-        f"chat_id: {entry.get('chat_id') or ''}",
-        f"channel_id: {channel_id}",
-        f"crontab: {entry.get('crontab') or ''}",
-        f"content_type: {content_type}",
+        f"jobname: {job.jobname}",
+        f"chat_id: {job.chat_id}",
+        f"channel_id: {job.channel_id}",
+        f"crontab: {job.crontab}",
+        f"content_type: {job.content_type}",
         f"message_thread_id: {message_thread_id if message_thread_id is not None else ''}",
-        f"option_delete_previous: {entry.get('option_delete_previous') or ''}",
-        f"photo_id: {photo_id}",
-        f"photo_group_id: {photo_group_id}",
+        f"option_delete_previous: {job.option_delete_previous}",
+        f"photo_id: {job.photo_id}",
+        f"photo_group_id: {job.photo_group_id}",
         "content:",
-        content,
+        job.content,
     ]
     if errors:
         latest_error = errors[-1].get("error") if isinstance(errors[-1], dict) else ""
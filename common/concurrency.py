@@ -0,0 +1,98 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Tuple
+
+import config
+from common import log
+
+
+class AdaptiveConcurrency:
+    """Semaphore whose width follows AIMD: +1 per healthy round of sends while
+    p95 latency and error rate stay under target, times a factor on overload."""
+
+    def __init__(
+        self,
+        initial: int = config.BATCH_SIZE,
+        min_limit: int = config.CONCURRENCY_MIN,
+        max_limit: int = config.CONCURRENCY_MAX,
+    ) -> None:
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # (latency, overloaded) of the most recent sends
+        self.samples: Deque[Tuple[float, bool]] = deque(
+            maxlen=config.CONCURRENCY_WINDOW
+        )
+        self.healthy = True
+        self.recorded = 0
+        self.last_decrease = 0.0
+
+    def width(self) -> int:
+        return int(self.limit)
+
+    async def __aenter__(self) -> "AdaptiveConcurrency":
+        while self.in_flight >= self.width():
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.wake()  # pass on the slot we were woken for
+                elif waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.in_flight -= 1
+        self.wake()
+
+    def wake(self) -> None:
+        free = self.width() - self.in_flight
+        while free > 0 and len(self.waiters) > 0:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def record(self, latency: float, overloaded: bool) -> None:
+        """Feeds back one send, `overloaded` for 429s and timeouts."""
+        self.samples.append((latency, overloaded))
+        self.recorded += 1
+        if overloaded:
+            self.decrease()
+            return
+
+        # stats are refreshed every few samples rather than on every send
+        if self.recorded % config.CONCURRENCY_STATS_EVERY == 0:
+            self.healthy = self.is_healthy()
+        if self.healthy:
+            # +1/limit per send adds up to +1 per round of `limit` sends
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.wake()
+
+    def is_healthy(self) -> bool:
+        if len(self.samples) <= 0:
+            return True
+        latencies = sorted(latency for latency, _ in self.samples)
+        p95 = latencies[math.ceil(len(latencies) * 0.95) - 1]
+        error_rate = sum(failed for _, failed in self.samples) / len(self.samples)
+        return (
+            p95 <= config.CONCURRENCY_LATENCY_TARGET
+            and error_rate <= config.CONCURRENCY_ERROR_TARGET
+        )
+
+    def decrease(self) -> None:
+        # one cut per cooldown, a burst of 429s is a single congestion signal
+        now = time.monotonic()
+        if now - self.last_decrease < config.CONCURRENCY_DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * config.CONCURRENCY_DECREASE)
+        log.logger.info(f"[API] Reduced send concurrency, limit={self.width()}")
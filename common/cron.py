@@ -0,0 +1,170 @@
+import re
+import config
+from croniter import croniter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# (low, high) of minute, hour, day of month, month, day of week
+RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+NAMES: Tuple[Dict[str, int], ...] = (
+    {},
+    {},
+    {},
+    {
+        name: i + 1
+        for i, name in enumerate(
+            "jan feb mar apr may jun jul aug sep oct nov dec".split()
+        )
+    },
+    {name: i for i, name in enumerate("sun mon tue wed thu fri sat".split())},
+)
+FIELD_RE = re.compile(r"^(\*|\w+(?:-\w+)?)(?:/(\d+))?$")
+FULL_DAYS = sum(1 << i for i in range(1, 32))
+FULL_MONTHS = sum(1 << i for i in range(1, 13))
+FULL_WEEKDAYS = 0b1111111
+MAX_YEARS_BETWEEN_MATCHES = 50  # same bound croniter uses before giving up
+MAX_DST_CHECK_DAYS = 62  # longer searches in zones with DST go through croniter
+
+
+class CronSchedule:
+    """Crontab compiled into one bitmask per field, bit i set if value i fires."""
+
+    __slots__ = ("minutes", "hours", "days", "months", "weekdays", "day_or")
+
+    def __init__(self, fields: List[int]) -> None:
+        self.minutes, self.hours, self.days, self.months, self.weekdays = fields
+        # like croniter, a restricted day of month and day of week fire on either
+        self.day_or = self.days != FULL_DAYS and self.weekdays != FULL_WEEKDAYS
+
+    def is_daily(self) -> bool:
+        # fires on the same minutes every day of the year
+        return (
+            self.days == FULL_DAYS
+            and self.weekdays == FULL_WEEKDAYS
+            and self.months == FULL_MONTHS
+        )
+
+    def matches_day(self, dt: datetime) -> bool:
+        dom = bool(self.days >> dt.day & 1)
+        dow = bool(self.weekdays >> (dt.isoweekday() % 7) & 1)
+        return (dom or dow) if self.day_or else (dom and dow)
+
+    def matches(self, dt: datetime) -> bool:
+        return (
+            bool(self.minutes >> dt.minute & 1)
+            and bool(self.hours >> dt.hour & 1)
+            and bool(self.months >> dt.month & 1)
+            and self.matches_day(dt)
+        )
+
+    def next_after(self, dt: datetime) -> Optional[datetime]:
+        """Next wall clock minute strictly after `dt` that fires, ignores tzinfo."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        end_year = dt.year + MAX_YEARS_BETWEEN_MATCHES
+        while dt.year <= end_year:
+            if not self.months >> dt.month & 1:
+                dt = first_of_next_month(dt)
+            elif not self.matches_day(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif not self.hours >> dt.hour & 1:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            else:
+                minute = next_bit(self.minutes, dt.minute)
+                if minute is not None:
+                    return dt.replace(minute=minute)
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+        return None
+
+
+def first_of_next_month(dt: datetime) -> datetime:
+    if dt.month == 12:
+        return dt.replace(year=dt.year + 1, month=1, day=1, hour=0, minute=0)
+    return dt.replace(month=dt.month + 1, day=1, hour=0, minute=0)
+
+
+def next_bit(mask: int, start: int) -> Optional[int]:
+    mask >>= start
+    if mask == 0:
+        return None
+    return start + (mask & -mask).bit_length() - 1
+
+
+def parse_value(value: str, i: int) -> int:
+    if value.isdigit():
+        return int(value)
+    return NAMES[i][value]  # KeyError for anything we do not support
+
+
+def compile_field(expr: str, i: int) -> int:
+    low, high = RANGES[i]
+    mask = 0
+    for part in expr.split(","):
+        m = FIELD_RE.match(part)
+        if m is None:
+            raise ValueError(f"unsupported cron field {part}")
+        value_range, step = m.group(1), int(m.group(2) or 1)
+        if value_range == "*":
+            start, stop = low, high
+        elif "-" in value_range:
+            start, stop = (parse_value(v, i) for v in value_range.split("-"))
+        else:
+            start = parse_value(value_range, i)
+            # "10/5" means "10-max/5"
+            stop = high if m.group(2) is not None else start
+        if step == 0 or start > stop or start < low or stop > high:
+            raise ValueError(f"invalid cron field {part}")
+        for value in range(start, stop + 1, step):
+            mask |= 1 << value
+    if i == 4 and mask >> 7 & 1:
+        mask = (mask | 1) & ~(1 << 7)  # sunday is both 0 and 7
+    return mask
+
+
+@lru_cache(maxsize=config.CRON_CACHE_SIZE)
+def compile_cron(crontab: str) -> Optional[CronSchedule]:
+    """Returns None for crontabs only croniter understands (aliases, L, #, seconds...)."""
+    fields = crontab.lower().split()
+    if len(fields) != 5:
+        return None
+    try:
+        return CronSchedule([compile_field(f, i) for i, f in enumerate(fields)])
+    except (ValueError, KeyError):
+        return None
+
+
+@lru_cache(maxsize=config.CRON_CACHE_SIZE)
+def get_croniter(crontab: str) -> croniter:
+    # get_next always resets the iterator to start_time, so instances can be shared
+    return croniter(crontab)
+
+
+def is_valid(crontab: str) -> bool:
+    return compile_cron(crontab) is not None or croniter.is_valid(crontab)
+
+
+def same_offset(start: datetime, end: datetime) -> bool:
+    # wall clock search is only exact if no DST transition happens in between
+    if isinstance(start.tzinfo, timezone) or start.tzinfo is None:
+        return True
+    if end - start > timedelta(days=MAX_DST_CHECK_DAYS):
+        return False
+    offset = start.utcoffset()
+    if end.replace(fold=1).utcoffset() != end.utcoffset():
+        return False  # ambiguous or skipped wall time
+    check = start
+    while check < end:
+        if check.utcoffset() != offset:
+            return False
+        check += timedelta(days=1)
+    return end.utcoffset() == offset
+
+
+def get_next(crontab: str, start: datetime) -> datetime:
+    """Next fire time after the tz aware `start`, in the same timezone."""
+    schedule = compile_cron(crontab)
+    if schedule is not None:
+        nextrun = schedule.next_after(start)
+        if nextrun is not None and same_offset(start, nextrun):
+            return nextrun
+    return get_croniter(crontab).get_next(datetime, start_time=start)
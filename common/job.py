@@ -0,0 +1,75 @@
+import config
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    """What the scheduler needs from a job document, parsed once per tick."""
+
+    id: Any
+    chat_id: Any
+    channel_id: Any
+    target_chat_id: Any  # the channel for channel jobs, else the chat
+    jobname: str
+    created_by: Any
+    crontab: str
+    content: str
+    content_type: str
+    photo_ids: Tuple[str, ...]
+    photo_group_id: str
+    message_thread_id: Optional[int]
+    previous_message_ids: Tuple[str, ...]
+    option_delete_previous: str
+    nextrun_ts: str
+    user_nextrun_ts: str
+    errors: Tuple[Dict[str, Any], ...]
+    bot_token: str
+    lease_token: str
+    utc_tz: Optional[str]
+    tz_offset: Optional[float]
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any]) -> "Job":
+        channel_id = entry.get("channel_id") or ""
+        chat_id = entry.get("chat_id") or ""
+        photo_id = entry.get("photo_id") or ""
+        previous_message_id = str(entry.get("previous_message_id") or "")
+        user_bot_token = entry.get("user_bot_token")
+        if user_bot_token is None:
+            user_bot_token = config.TELEGRAM_BOT_TOKEN
+        return cls(
+            id=entry["_id"],
+            chat_id=chat_id,
+            channel_id=channel_id,
+            target_chat_id=channel_id if channel_id != "" else chat_id,
+            jobname=entry.get("jobname") or "",
+            created_by=entry.get("created_by"),
+            crontab=entry.get("crontab") or "",
+            content=entry.get("content") or "",
+            content_type=entry.get("content_type") or "",
+            photo_ids=tuple(photo_id.split(";")) if photo_id != "" else (),
+            photo_group_id=str(entry.get("photo_group_id") or ""),
+            message_thread_id=entry.get("message_thread_id"),
+            previous_message_ids=(
+                tuple(previous_message_id.split(";"))
+                if previous_message_id != ""
+                else ()
+            ),
+            option_delete_previous=entry.get("option_delete_previous") or "",
+            nextrun_ts=entry.get("nextrun_ts") or "",
+            user_nextrun_ts=entry.get("user_nextrun_ts") or "",
+            errors=tuple(entry.get("errors") or ()),
+            bot_token=user_bot_token,
+            lease_token=entry.get("lease_token") or "",
+            utc_tz=entry.get("utc_tz"),
+            tz_offset=entry.get("tz_offset"),
+        )
+
+    @property
+    def photo_id(self) -> str:
+        return ";".join(self.photo_ids)
+
+    @property
+    def previous_message_id(self) -> str:
+        return ";".join(self.previous_message_ids)
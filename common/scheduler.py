@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import config
+from common import log
+
+
+class TickScheduler:
+    """Runs `tick` on every wall clock interval boundary (every minute by default)."""
+
+    def __init__(
+        self,
+        tick: Callable[[], Awaitable[Any]],
+        interval: float = config.SCHEDULER_INTERVAL,
+        offset: float = config.SCHEDULER_TICK_OFFSET,
+    ) -> None:
+        self.tick = tick
+        self.interval = interval
+        self.offset = offset
+        self.loop_task: Optional[asyncio.Task] = None
+        self.tick_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.loop_task is None:
+            self.loop_task = asyncio.create_task(self.run_forever())
+            log.logger.info(
+                f"[SCHEDULER] Started in-process scheduler, interval={self.interval}s"
+            )
+
+    async def stop(self, timeout: float = config.SCHEDULER_SHUTDOWN_TIMEOUT) -> None:
+        if self.loop_task is not None:
+            self.loop_task.cancel()
+            try:
+                await self.loop_task
+            except asyncio.CancelledError:
+                pass
+            self.loop_task = None
+
+        # let an in-flight tick finish so its updates are not lost
+        if self.tick_task is not None and not self.tick_task.done():
+            try:
+                await asyncio.wait_for(self.tick_task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                log.logger.warning("[SCHEDULER] Cancelled in-flight tick on shutdown")
+        log.logger.info("[SCHEDULER] Stopped in-process scheduler")
+
+    def next_boundary(self, now: float) -> float:
+        return (now // self.interval + 1) * self.interval
+
+    async def run_forever(self) -> None:
+        while True:
+            boundary = self.next_boundary(time.time())
+            await asyncio.sleep(max(boundary + self.offset - time.time(), 0))
+            # sleep may wake up early, never tick before the boundary
+            while (delay := boundary + self.offset - time.time()) > 0:
+                await asyncio.sleep(delay)
+
+            # overlapping ticks are skipped, jobs due now are still matched by the
+            # next tick's nextrun <= now query
+            if self.tick_task is not None and not self.tick_task.done():
+                log.logger.warning(
+                    "[SCHEDULER] Previous tick still running, skipping this tick"
+                )
+                continue
+
+            self.tick_task = asyncio.create_task(self.run_tick())
+
+    async def run_tick(self) -> None:
+        try:
+            await self.tick()
+        except Exception as e:
+            log.logger.error(f"[SCHEDULER] Tick failed: {type(e).__name__} - {e}")
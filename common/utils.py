@@ -1,14 +1,15 @@
 import re
 import config
-from croniter import croniter
-from datetime import datetime, timezone, timedelta
-from typing import Optional, Tuple, List
+import numpy as np
+from common import cron
+from datetime import datetime, timezone, timedelta, tzinfo
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, List
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
-def calc_next_run(
-    crontab: str, user_timezone: str, user_tz_offset: float
-) -> Tuple[str, str]:
+@lru_cache(maxsize=config.TZ_CACHE_SIZE)
+def get_timezone(user_timezone: str, user_tz_offset: float) -> tzinfo:
     user_tz = None
     if user_timezone:
         try:
@@ -18,21 +19,96 @@ def calc_next_run(
 
     if user_tz is None or (user_timezone == "UTC" and user_tz_offset != 0):
         user_tz = timezone(timedelta(hours=user_tz_offset))
+    return user_tz
 
-    user_now = datetime.now(user_tz)
-    user_iter = croniter(crontab, user_now)
-    user_nextrun_datetime = user_iter.get_next(datetime)
+
+def calc_next_run(
+    crontab: str, user_timezone: str, user_tz_offset: float
+) -> Tuple[str, str]:
+    # the next run only depends on the current minute, jobs sharing a crontab and
+    # timezone within the same minute share the result
+    now_mins = epoch_mins(datetime.now(timezone.utc))
+    return calc_next_run_at(
+        crontab, user_timezone, user_tz_offset, now_mins, config.TZ_OFFSET
+    )
+
+
+@lru_cache(maxsize=config.CRON_CACHE_SIZE)
+def calc_next_run_at(
+    crontab: str,
+    user_timezone: str,
+    user_tz_offset: float,
+    now_mins: int,
+    db_tz_offset: float,
+) -> Tuple[str, str]:
+    user_tz = get_timezone(user_timezone, user_tz_offset)
+    user_now = datetime.fromtimestamp(now_mins * 60, user_tz)
+    user_nextrun_datetime = cron.get_next(crontab, user_now)
     if user_nextrun_datetime.tzinfo is None:
         user_nextrun_datetime = user_nextrun_datetime.replace(tzinfo=user_tz)
     user_nextrun_ts = parse_time_mins(user_nextrun_datetime)
 
-    db_tz = timezone(timedelta(hours=config.TZ_OFFSET))
+    db_tz = get_timezone("", db_tz_offset)
     db_nextrun_datetime = user_nextrun_datetime.astimezone(tz=db_tz)
     db_nextrun_ts = parse_time_mins(db_nextrun_datetime)
 
     return (user_nextrun_ts, db_nextrun_ts)
 
 
+def calc_next_runs(
+    jobs: List[Tuple[str, str, float]]
+) -> List[Optional[Tuple[str, str]]]:
+    """Batch calc_next_run for (crontab, user_timezone, user_tz_offset) tuples,
+    None where the crontab is invalid."""
+    now_mins = epoch_mins(datetime.now(timezone.utc))
+    results: Dict[Tuple[str, str, float], Optional[Tuple[str, str]]] = {}
+    daily = []
+    for job in set(jobs):
+        schedule = cron.compile_cron(job[0])
+        if schedule is not None and schedule.is_daily():
+            daily.append((job, schedule))
+            continue
+        try:
+            results[job] = calc_next_run_at(*job, now_mins, config.TZ_OFFSET)
+        except Exception:
+            results[job] = None
+
+    if len(daily) > 0:
+        results.update(calc_daily_next_runs(daily, now_mins))
+    return [results[job] for job in jobs]
+
+
+def calc_daily_next_runs(
+    daily: List[Tuple[Tuple[str, str, float], cron.CronSchedule]], now_mins: int
+) -> Dict[Tuple[str, str, float], Optional[Tuple[str, str]]]:
+    # one row of 1440 minute of day flags per schedule, twice to wrap past midnight
+    hours = np.array([s.hours for _, s in daily], dtype=np.uint64)
+    minutes = np.array([s.minutes for _, s in daily], dtype=np.uint64)
+    hour_bits = (hours[:, None] >> np.arange(24, dtype=np.uint64)) & np.uint64(1)
+    minute_bits = (minutes[:, None] >> np.arange(60, dtype=np.uint64)) & np.uint64(1)
+    day_mask = (hour_bits[:, :, None] & minute_bits[:, None, :]).reshape(-1, 1440)
+    day_mask = np.concatenate([day_mask, day_mask], axis=1).astype(bool)
+
+    user_tzs = [get_timezone(job[1], job[2]) for job, _ in daily]
+    user_nows = [datetime.fromtimestamp(now_mins * 60, tz) for tz in user_tzs]
+    minute_of_day = np.array([d.hour * 60 + d.minute for d in user_nows])
+    window = minute_of_day[:, None] + 1 + np.arange(1440)
+    deltas = np.take_along_axis(day_mask, window, axis=1).argmax(axis=1) + 1
+
+    db_tz = get_timezone("", config.TZ_OFFSET)
+    results = {}
+    for (job, _), user_tz, user_now, delta in zip(daily, user_tzs, user_nows, deltas):
+        user_nextrun = datetime.fromtimestamp((now_mins + int(delta)) * 60, user_tz)
+        if not cron.same_offset(user_now, user_nextrun):
+            results[job] = calc_next_run_at(*job, now_mins, config.TZ_OFFSET)
+            continue
+        results[job] = (
+            parse_time_mins(user_nextrun),
+            parse_time_mins(user_nextrun.astimezone(tz=db_tz)),
+        )
+    return results
+
+
 def format_timezone(timezone: str, display_offset: float) -> str:
     if timezone != "UTC":
         try:
@@ -95,6 +171,19 @@ def parse_time_mins(datetime_obj: datetime) -> str:
     return datetime_obj.strftime("%Y-%m-%d %H:%M")
 
 
+def epoch_mins(datetime_obj: datetime) -> int:
+    return int(datetime_obj.timestamp() // 60)
+
+
+def ts_to_epoch_mins(ts: str) -> Optional[int]:
+    # db timestamps are "%Y-%m-%d %H:%M[:%S.%f]" strings in config.TZ_OFFSET
+    if not ts:
+        return None
+    db_tz = timezone(timedelta(hours=config.TZ_OFFSET))
+    datetime_obj = datetime.strptime(ts[:16], "%Y-%m-%d %H:%M")
+    return epoch_mins(datetime_obj.replace(tzinfo=db_tz))
+
+
 def parse_time_millis(datetime_obj: datetime) -> str:
     return datetime_obj.strftime("%Y-%m-%d %H:%M:%S.%f")
 
@@ -6,23 +6,84 @@ load_dotenv()
 """ General config """
 TZ_OFFSET = 8.0  # (UTC+08:00)
 JOB_LIMIT_PER_PERSON = 10
-BATCH_SIZE = 80  # Max number of messages to send at any given time
+BATCH_SIZE = 80  # Initial number of messages to send at any given time
+CONCURRENCY_MIN = 10  # Bounds for the adaptive send concurrency
+CONCURRENCY_MAX = 500
+CONCURRENCY_LATENCY_TARGET = 2  # seconds, p95 send latency to keep growing under
+CONCURRENCY_ERROR_TARGET = 0.05  # share of 429s/timeouts to keep growing under
+CONCURRENCY_WINDOW = 200  # recent sends the targets are checked against
+CONCURRENCY_STATS_EVERY = 20  # sends between p95/error rate refreshes
+CONCURRENCY_DECREASE = 0.7  # factor applied on a 429 or timeout
+CONCURRENCY_DECREASE_COOLDOWN = 1  # seconds between decreases
 RETRIES = 1  # Number of retries if message fails to send
+SEND_RETRY_ATTEMPTS = 3  # In-tick resends after a 429 or transient error
+SEND_RETRY_BACKOFF = 1  # seconds before the first in-tick resend, doubled each time
+SEND_RETRY_MAX_DELAY = 30  # seconds, longer waits are left to the next tick
 BOT_NAME = "@cron_telebot"
+CRON_CACHE_SIZE = 1024  # Max number of parsed crontabs and computed next runs kept
+TZ_CACHE_SIZE = 256  # Max number of timezone objects kept
+# Open the Mongo pool and Telegram connections before reporting ready
+WARMUP_ON_STARTUP = getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+""" Scheduler config """
+# Run the tick loop in-process instead of relying on an external cron hitting /api
+SCHEDULER_ENABLED = getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+SCHEDULER_INTERVAL = 60  # seconds between ticks, aligned to the wall clock
+SCHEDULER_TICK_OFFSET = 0.05  # seconds to wait past each boundary before ticking
+SCHEDULER_SHUTDOWN_TIMEOUT = 30  # seconds to wait for an in-flight tick on shutdown
+CLAIM_BATCH_SIZE = 500  # Max number of due jobs claimed per update_many
+SINK_BATCH_SIZE = 200  # Max number of job updates per bulk_write
+SINK_FLUSH_INTERVAL = 1  # seconds between bulk_write flushes during a tick
+READ_BATCH_SIZE = 500  # Claimed jobs read from the cursor per batch
+TICK_QUEUE_SIZE = 1000  # Max number of read jobs waiting for a worker
+TICK_WORKERS = 500  # Max number of workers draining the queue each tick
 
 """ Telegram config """
 TELEGRAM_BOT_TOKEN = getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_API_BASE_URL = "https://api.telegram.org"
 BOTHOST = getenv("BOTHOST")
+BOT_RATE_LIMIT = 30  # messages per second per bot
+BOT_RATE_BURST = 30
+CHAT_RATE_LIMIT = 1  # messages per second per chat
+CHAT_RATE_BURST = 1
+GROUP_RATE_LIMIT = 20 / 60  # messages per second per group
+GROUP_RATE_BURST = 20
+RATE_LIMIT_MAX_BUCKETS = 10000  # idle rate limit buckets are dropped past this
+HTTP_POOL_SIZE = 600  # Max open connections, sends plus downloads and bot replies
+HTTP_POOL_SIZE_PER_HOST = 500  # Telegram API connections, ~CONCURRENCY_MAX
+HTTP_KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept for reuse
+HTTP_DNS_CACHE_TTL = 300  # seconds resolved addresses are cached
+HTTP_CONNECT_TIMEOUT = 5  # seconds to get a connection, pool wait included
+SEND_READ_TIMEOUT = 20  # seconds between reads for send* and other API calls
+SEND_TIMEOUT = 30
+GET_FILE_READ_TIMEOUT = 10  # seconds between reads for getFile
+GET_FILE_TIMEOUT = 15
+DOWNLOAD_READ_TIMEOUT = 30  # seconds between reads for file downloads
+DOWNLOAD_TIMEOUT = 60
+WARMUP_HTTP_CONNECTIONS = 20  # Telegram API connections opened on startup
+FILE_PATH_TTL = 55 * 60  # seconds getFile paths are reused, Telegram keeps them 1h
+FILE_PATH_INVALID_TTL = 10 * 60  # seconds file_ids rejected by getFile are skipped
+FILE_PATH_CACHE_SIZE = 10000  # Max number of getFile results kept
+PHOTO_TRANSFER_CACHE_SIZE = 10000  # Transferred file_ids kept in front of Mongo
+PHOTO_DOWNLOAD_CONCURRENCY = 4  # Photos of one album downloaded at the same time
+PHOTO_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Downloaded photos kept in memory
+PHOTO_CACHE_SPILL_DIR = getenv("PHOTO_CACHE_SPILL_DIR")  # Evicted photos go here
+PHOTO_CACHE_SPILL_MAX_BYTES = 512 * 1024 * 1024
 
 """ DB config """
+# Backfills and indexes job_data on startup, otherwise run `python -m database.migrations`
+RUN_MIGRATIONS_ON_STARTUP = (
+    getenv("RUN_MIGRATIONS_ON_STARTUP", "false").lower() == "true"
+)
 MONGODB_CONNECTION_STRING = getenv("MONGODB_CONNECTION_STRING")
+MONGODB_MIN_POOL_SIZE = 10  # Connections the Motor pool keeps open, used on warm-up
 MONGODB_DB = "rm_bot"
 MONGODB_JOB_DATA_COLLECTION = "job_data"
 MONGODB_CHAT_DATA_COLLECTION = "chat_data"
 MONGODB_USER_DATA_COLLECTION = "user_data"
 MONGODB_BOT_DATA_COLLECTION = "bot_data"
 MONGODB_USER_WHITELIST_COLLECTION = "whitelist"
+MONGODB_PHOTO_TRANSFER_COLLECTION = "photo_transfers"
 
 INFLUXDB_TOKEN = getenv("INFLUXDB_TOKEN")
 INFLUXDB_ORG = "main"
@@ -1,5 +1,6 @@
 from database.dbutils.dbutils_chat import *
 from database.dbutils.dbutils_job import *
 from database.dbutils.dbutils_bot import *
+from database.dbutils.dbutils_photo import *
 from database.dbutils.dbutils_whitelist import *
 from database.dbutils.dbutils_influx import *
@@ -1,7 +1,7 @@
 from common import log, utils
 from database.dbutils.dbutils_empty import empty_update_result
 from database.mongo import MongoService
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, Optional
 from datetime import datetime
 from telegram import Update
 from pymongo.errors import PyMongoError
@@ -21,6 +21,22 @@ async def find_chat_by_chatid(db_service: MongoService, chat_id: int) -> Optiona
         return None
 
 
+async def find_chats_tz_by_chatids(
+    db_service: MongoService, chat_ids: Iterable[int]
+) -> Dict[float, Any]:
+    chat_ids = {float(chat_id) for chat_id in chat_ids if chat_id != ""}
+    q = {"chat_id": {"$in": list(chat_ids)}}
+    projection = {"_id": 0, "chat_id": 1, "tz_offset": 1, "utc_tz": 1}
+    try:
+        entries = await db_service.find_chat_entries(q, projection)
+    except PyMongoError as e:
+        log.logger.warning(
+            f"[DB] find_chats_tz_by_chatids failed: {type(e).__name__} - {e}"
+        )
+        return {}
+    return {float(entry["chat_id"]): entry for entry in entries}
+
+
 async def find_chat_by_title(
     db_service: MongoService, user_id: int, chat_title: str
 ) -> Optional[Any]:
@@ -108,6 +124,15 @@ async def update_chats_tz_by_type(
         log.logger.info(
             f"[DB] Bulk updated timezone for {modified_count} chats, chat_type={chat_type}, user_id={user_id}, new tz_offset={tz_offset}"
         )
+
+        # keep the timezone copied onto jobs targeting these chats in sync
+        chats = await db_service.find_chat_entries(q, {"chat_id": 1})
+        chat_ids = [chat["chat_id"] for chat in chats]
+        job_q = {
+            "$or": [{"chat_id": {"$in": chat_ids}}, {"channel_id": {"$in": chat_ids}}]
+        }
+        job_payload = {"tz_offset": tz_offset, "utc_tz": utc_tz}
+        await db_service.update_multiple_entries(job_q, job_payload)
         return mongo_response
     except PyMongoError as e:
         log.logger.warning(
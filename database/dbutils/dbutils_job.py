@@ -1,9 +1,10 @@
+import config
 from pymongo import ASCENDING, DESCENDING
 from common import utils, log
 from common.enums import ContentType
 from database.dbutils.dbutils_empty import empty_update_result
 from database.mongo import MongoService
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from pymongo.results import UpdateResult, InsertOneResult
 from pymongo.errors import PyMongoError
 
@@ -12,16 +13,43 @@ from pymongo.errors import PyMongoError
 Queries
 """
 
+# fields the scheduler reads when sending a job and notifying its creator
+SEND_PROJECTION = {
+    field: 1
+    for field in (
+        "chat_id",
+        "channel_id",
+        "jobname",
+        "created_by",
+        "crontab",
+        "content",
+        "content_type",
+        "photo_id",
+        "photo_group_id",
+        "message_thread_id",
+        "previous_message_id",
+        "option_delete_previous",
+        "nextrun_ts",
+        "user_nextrun_ts",
+        "errors",
+        "user_bot_token",
+        "lease_token",
+        "utc_tz",
+        "tz_offset",
+    )
+}
+
 
 def make_due_jobs_query(ts: str):
-    base_q = {"nextrun_ts": {"$lte": ts}, "removed_ts": "", "crontab": {"$ne": ""}}
     # Only return messages that are not pending, or pending for more than 5 mins.
-    base_q["$or"] = [{"pending_ts": None}, {"pending_ts": {"$lte": utils.now(-5)}}]
+    # Relies on paused_ts/pending_ts defaulting to "" (see migrations), "" sorts
+    # before any timestamp so one range covers both cases.
     return {
-        "$or": [
-            {"paused_ts": "", **base_q},
-            {"paused_ts": {"$exists": False}, **base_q},
-        ]
+        "nextrun_min": {"$lte": utils.ts_to_epoch_mins(ts)},
+        "pending_ts": {"$lte": utils.now(-5)},
+        "removed_ts": "",
+        "paused_ts": "",
+        "crontab": {"$ne": ""},
     }
 
 
@@ -75,17 +103,29 @@ async def find_entries_removed_between(
         return []
 
 
-async def find_entries_by_nextrun(
-    db_service: MongoService, ts: str
-) -> List[Optional[Any]]:
-    q = make_due_jobs_query(ts)
+async def iter_entries_by_lease(
+    db_service: MongoService,
+    lease_token: str,
+    batch_size: int = config.READ_BATCH_SIZE,
+) -> AsyncIterator[List[Any]]:
+    # streams the claimed jobs in batches instead of loading them all at once
+    q = {"lease_token": lease_token, "removed_ts": ""}
+    cursor = db_service.find_entries_cursor(
+        q, [("created_ts", ASCENDING)], batch_size, SEND_PROJECTION
+    )
+    batch = []
     try:
-        return await db_service.find_entries(q, [("created_ts", ASCENDING)])
+        async for entry in cursor:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
     except PyMongoError as e:
         log.logger.warning(
-            f"[DB] find_entries_by_nextrun failed: {type(e).__name__} - {e}"
+            f"[DB] iter_entries_by_lease failed: {type(e).__name__} - {e}"
         )
-        return []
+    if len(batch) > 0:
+        yield batch
 
 
 async def find_entries_by_content_type(
@@ -157,6 +197,8 @@ async def add_new_entry(
     user_nextrun_ts: str = "",
     user_bot_token: Optional[str] = None,
     message_thread_id: Optional[int] = None,
+    tz_offset: Optional[float] = None,
+    utc_tz: Optional[str] = None,
     errors: Optional[List[Exception]] = None,
 ) -> Optional[InsertOneResult]:
     if errors is None:
@@ -179,12 +221,16 @@ async def add_new_entry(
                 "previous_message_id": "",
                 "option_delete_previous": "",
                 "nextrun_ts": nextrun_ts,
+                "nextrun_min": utils.ts_to_epoch_mins(nextrun_ts),
                 "user_nextrun_ts": user_nextrun_ts,
-                "pending_ts": None,
+                "pending_ts": "",
+                "paused_ts": "",
                 "removed_ts": "",
                 "remarks": "",
                 "user_bot_token": user_bot_token,
                 "message_thread_id": message_thread_id,
+                "tz_offset": tz_offset,
+                "utc_tz": utc_tz,
                 "errors": errors,
             }
         )
@@ -195,6 +241,33 @@ async def add_new_entry(
     return result
 
 
+async def claim_due_jobs(
+    db_service: MongoService,
+    ts: str,
+    lease_token: str,
+    limit: int = config.CLAIM_BATCH_SIZE,
+) -> int:
+    # Marks due jobs as pending under lease_token, a batch at a time. Jobs claimed
+    # by another worker in between no longer match the due-jobs query.
+    q = {**make_due_jobs_query(ts), "lease_token": {"$ne": lease_token}}
+    payload = {"pending_ts": utils.now(), "lease_token": lease_token}
+    claimed = 0
+    try:
+        while True:
+            ids = await db_service.find_entry_ids(q, limit, [("created_ts", ASCENDING)])
+            if len(ids) <= 0:
+                break
+            res = await db_service.update_multiple_entries(
+                {**q, "_id": {"$in": ids}}, {**payload}
+            )
+            claimed += res.modified_count
+            if res.modified_count <= 0 or len(ids) < limit:
+                break
+    except PyMongoError as e:
+        log.logger.warning(f"[DB] claim_due_jobs failed: {type(e).__name__} - {e}")
+    return claimed
+
+
 async def update_entry_by_jobname(
     db_service: MongoService, entry: Optional[Any], update: Optional[Any], q: Dict = {}
 ) -> UpdateResult:
@@ -245,6 +318,21 @@ async def update_entry_by_jobid(
         return empty_update_result()
 
 
+async def update_entries_tz_by_chatid(
+    db_service: MongoService, chat_id: int, tz_offset: float, utc_tz: str
+) -> UpdateResult:
+    # jobs carry their target chat's timezone so the scheduler never reads chat_data
+    q = {"$or": [{"chat_id": chat_id}, {"channel_id": chat_id}]}
+    payload = {"tz_offset": tz_offset, "utc_tz": utc_tz}
+    try:
+        return await db_service.update_multiple_entries(q, payload)
+    except PyMongoError as e:
+        log.logger.warning(
+            f"[DB] update_entries_tz_by_chatid failed: {type(e).__name__} - {e}"
+        )
+        return empty_update_result()
+
+
 async def remove_entries_by_chat(
     db_service: MongoService, chat_id: int
 ) -> UpdateResult:
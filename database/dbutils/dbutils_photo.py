@@ -0,0 +1,39 @@
+from database.mongo import MongoService
+from common import log
+from typing import Optional
+from pymongo.errors import PyMongoError
+
+"""
+Getters
+"""
+
+
+async def find_transferred_photo_id(
+    db_service: MongoService, source_file_id: str, target_bot_id: str
+) -> Optional[str]:
+    q = {"source_file_id": source_file_id, "target_bot_id": target_bot_id}
+    try:
+        entry = await db_service.find_one_photo_transfer(q)
+    except PyMongoError as e:
+        log.logger.warning(
+            f"[DB] find_transferred_photo_id failed: {type(e).__name__} - {e}"
+        )
+        return None
+    return entry.get("file_id") if entry is not None else None
+
+
+"""
+Setters
+"""
+
+
+async def save_transferred_photo_id(
+    db_service: MongoService, source_file_id: str, target_bot_id: str, file_id: str
+) -> None:
+    q = {"source_file_id": source_file_id, "target_bot_id": target_bot_id}
+    try:
+        await db_service.update_one_photo_transfer(q, {"file_id": file_id})
+    except PyMongoError as e:
+        log.logger.warning(
+            f"[DB] save_transferred_photo_id failed: {type(e).__name__} - {e}"
+        )
@@ -0,0 +1,87 @@
+import asyncio
+import config
+from common import log, utils
+from database.mongo import MongoService
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import PyMongoError
+
+BATCH_SIZE = 1000
+
+
+async def backfill_nextrun_mins(db_service: MongoService) -> int:
+    q = {"nextrun_min": {"$exists": False}}
+    projection = {"nextrun_ts": 1}
+    cursor = db_service.main_collection.find(q, projection)
+
+    ops, count = [], 0
+    async for entry in cursor:
+        nextrun_min = utils.ts_to_epoch_mins(entry.get("nextrun_ts") or "")
+        ops.append(
+            UpdateOne({"_id": entry["_id"]}, {"$set": {"nextrun_min": nextrun_min}})
+        )
+        if len(ops) >= BATCH_SIZE:
+            await db_service.bulk_update_entries(ops)
+            count, ops = count + len(ops), []
+    if ops:
+        await db_service.bulk_update_entries(ops)
+        count += len(ops)
+
+    log.logger.info(f"[DB] Backfilled nextrun_min for {count} jobs")
+    return count
+
+
+async def normalize_job_defaults(db_service: MongoService) -> int:
+    # lets make_due_jobs_query match "" instead of "" / null / missing
+    collection = db_service.main_collection
+    paused = await collection.update_many(
+        {"paused_ts": {"$exists": False}}, {"$set": {"paused_ts": ""}}
+    )
+    pending = await collection.update_many(
+        {"pending_ts": None}, {"$set": {"pending_ts": ""}}
+    )
+    count = paused.modified_count + pending.modified_count
+    log.logger.info(f"[DB] Normalized paused_ts/pending_ts defaults on {count} jobs")
+    return count
+
+
+async def backfill_job_timezones(db_service: MongoService) -> int:
+    # copies each chat's timezone onto the jobs that are sent to it
+    projection = {"chat_id": 1, "tz_offset": 1, "utc_tz": 1}
+    cursor = db_service.chat_data_collection.find({}, projection)
+
+    ops, count = [], 0
+    async for chat in cursor:
+        chat_id = chat.get("chat_id")
+        target = {
+            "$or": [
+                {"channel_id": chat_id},
+                {"channel_id": {"$in": ["", None]}, "chat_id": chat_id},
+            ]
+        }
+        q = {"utc_tz": {"$exists": False}, **target}
+        payload = {"tz_offset": chat.get("tz_offset"), "utc_tz": chat.get("utc_tz")}
+        ops.append(UpdateMany(q, {"$set": payload}))
+        if len(ops) >= BATCH_SIZE:
+            await db_service.bulk_update_entries(ops)
+            count, ops = count + len(ops), []
+    if ops:
+        await db_service.bulk_update_entries(ops)
+        count += len(ops)
+
+    log.logger.info(f"[DB] Backfilled job timezones from {count} chats")
+    return count
+
+
+async def run(db_service: MongoService) -> None:
+    # one-off, idempotent so re-running it is harmless
+    try:
+        await backfill_nextrun_mins(db_service)
+        await normalize_job_defaults(db_service)
+        await backfill_job_timezones(db_service)
+        await db_service.ensure_indexes()
+    except PyMongoError as e:
+        log.logger.warning(f"[DB] Migrations failed: {type(e).__name__} - {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(MongoService(config.MONGODB_CONNECTION_STRING)))
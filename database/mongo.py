@@ -1,16 +1,23 @@
 import config
 from common import utils
 from typing import Any, List, Optional
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
-from pymongo.results import UpdateResult, InsertOneResult
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorCursor,
+)
+from pymongo import ASCENDING
+from pymongo.results import BulkWriteResult, UpdateResult, InsertOneResult
 
 
 class MongoService:
-    def __init__(self, conn_str=config.MONGODB_CONNECTION_STRING) -> None:
+    def __init__(
+        self, conn_str=config.MONGODB_CONNECTION_STRING, min_pool_size: int = 0
+    ) -> None:
         # Provide the mongodb atlas url to connect python to mongodb using pymongo
 
         # Create a connection using MongoClient. You can import MongoClient or use pymongo.MongoClient
-        self.client = AsyncIOMotorClient(conn_str)
+        self.client = AsyncIOMotorClient(conn_str, minPoolSize=min_pool_size)
         self.db = self.client[config.MONGODB_DB]
         self.main_collection = self.db[config.MONGODB_JOB_DATA_COLLECTION]
         self.chat_data_collection = self.db[config.MONGODB_CHAT_DATA_COLLECTION]
@@ -19,6 +26,9 @@ class MongoService:
         self.user_whitelist_collection = self.db[
             config.MONGODB_USER_WHITELIST_COLLECTION
         ]
+        self.photo_transfer_collection = self.db[
+            config.MONGODB_PHOTO_TRANSFER_COLLECTION
+        ]
 
     def get_collection(self, collection_name: str) -> AsyncIOMotorCollection:
         db = getattr(self, "db")
@@ -27,6 +37,30 @@ class MongoService:
     def disconnect(self) -> AsyncIOMotorCollection:
         self.client.close()
 
+    async def ping(self) -> None:
+        # the first command does the server selection and auth handshake
+        await self.client.admin.command("ping")
+
+    async def ensure_indexes(self) -> None:
+        # serves make_due_jobs_query as a single range scan
+        await self.main_collection.create_index(
+            [("nextrun_min", ASCENDING), ("pending_ts", ASCENDING)],
+            name="due_jobs",
+            partialFilterExpression={"removed_ts": "", "paused_ts": ""},
+        )
+        # serves iter_entries_by_lease, released jobs have an empty lease_token
+        await self.main_collection.create_index(
+            [("lease_token", ASCENDING), ("created_ts", ASCENDING)],
+            name="job_lease",
+            partialFilterExpression={"lease_token": {"$gt": ""}},
+        )
+        # serves find_transferred_photo_id, one file_id per photo and bot
+        await self.photo_transfer_collection.create_index(
+            [("source_file_id", ASCENDING), ("target_bot_id", ASCENDING)],
+            name="photo_transfer",
+            unique=True,
+        )
+
     async def insert_new_entry(self, q: Optional[Any]) -> InsertOneResult:
         now = utils.now()
         q["created_ts"] = now
@@ -34,13 +68,36 @@ class MongoService:
         return await self.main_collection.insert_one(q)
 
     async def find_entries(
-        self, q: Optional[Any], sort: Optional[Any] = None
+        self,
+        q: Optional[Any],
+        sort: Optional[Any] = None,
+        projection: Optional[Any] = None,
     ) -> List[Optional[Any]]:
-        cursor = self.main_collection.find(q)
+        cursor = self.main_collection.find(q, projection)
         if sort is not None:
             cursor = cursor.sort(sort)
         return await cursor.to_list(length=None)
 
+    def find_entries_cursor(
+        self,
+        q: Optional[Any],
+        sort: Optional[Any] = None,
+        batch_size: int = 0,
+        projection: Optional[Any] = None,
+    ) -> AsyncIOMotorCursor:
+        cursor = self.main_collection.find(q, projection).batch_size(batch_size)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        return cursor
+
+    async def find_entry_ids(
+        self, q: Optional[Any], limit: int, sort: Optional[Any] = None
+    ) -> List[Any]:
+        cursor = self.main_collection.find(q, {"_id": 1}).limit(limit)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        return [entry["_id"] for entry in await cursor.to_list(length=None)]
+
     async def find_one_entry(self, q: Optional[Any]) -> Optional[Any]:
         return await self.main_collection.find_one(q)
 
@@ -57,6 +114,9 @@ class MongoService:
         update["last_update_ts"] = utils.now()
         return await self.main_collection.update_one(q, {"$set": update})
 
+    async def bulk_update_entries(self, ops: List[Any]) -> BulkWriteResult:
+        return await self.main_collection.bulk_write(ops, ordered=False)
+
     async def count_entries(self, q: Optional[Any]) -> int:
         return await self.main_collection.count_documents(q)
 
@@ -67,8 +127,10 @@ class MongoService:
     async def find_one_chat_entry(self, q: Optional[Any]) -> Optional[Any]:
         return await self.chat_data_collection.find_one(q)
 
-    async def find_chat_entries(self, q: Optional[Any]) -> Optional[Any]:
-        cursor = self.chat_data_collection.find(q)
+    async def find_chat_entries(
+        self, q: Optional[Any], projection: Optional[Any] = None
+    ) -> Optional[Any]:
+        cursor = self.chat_data_collection.find(q, projection)
         return await cursor.to_list(length=None)
 
     async def update_chat_entries(
@@ -110,3 +172,14 @@ class MongoService:
 
     async def find_one_whitelist(self, q: Optional[Any]) -> Optional[Any]:
         return await self.user_whitelist_collection.find_one(q)
+
+    async def find_one_photo_transfer(self, q: Optional[Any]) -> Optional[Any]:
+        return await self.photo_transfer_collection.find_one(q)
+
+    async def update_one_photo_transfer(
+        self, q: Optional[Any], update: Optional[Any]
+    ) -> UpdateResult:
+        update["updated_at"] = utils.now()
+        return await self.photo_transfer_collection.update_one(
+            q, {"$set": update}, upsert=True
+        )
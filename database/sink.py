@@ -0,0 +1,70 @@
+import asyncio
+import config
+from common import log, utils
+from database.mongo import MongoService
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+
+class JobUpdateSink:
+    """Buffers per-job updates and writes them as unordered bulk_write batches."""
+
+    def __init__(
+        self,
+        db_service: MongoService,
+        batch_size: int = config.SINK_BATCH_SIZE,
+        flush_interval: float = config.SINK_FLUSH_INTERVAL,
+    ) -> None:
+        self.db_service = db_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ops: List[UpdateOne] = []
+        self.timer_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.timer_task is None:
+            self.timer_task = asyncio.create_task(self.flush_periodically())
+
+    async def close(self) -> None:
+        if self.timer_task is not None:
+            self.timer_task.cancel()
+            try:
+                await self.timer_task
+            except asyncio.CancelledError:
+                pass
+            self.timer_task = None
+        await self.flush()
+
+    async def add(self, job_id: Any, update: Dict[str, Any], q: Dict = {}) -> None:
+        q = {**q, "_id": job_id, "removed_ts": ""}
+        update = {**update, "last_update_ts": utils.now()}
+        self.ops.append(UpdateOne(q, {"$set": update}))
+        if len(self.ops) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        if len(self.ops) <= 0:
+            return 0
+
+        # swap the buffer first so updates added while awaiting go to the next batch
+        ops, self.ops = self.ops, []
+        try:
+            res = await self.db_service.bulk_update_entries(ops)
+        except PyMongoError as e:
+            log.logger.warning(
+                f"[DB] Failed to flush {len(ops)} job updates: {type(e).__name__} - {e}"
+            )
+            return 0
+
+        unmatched = len(ops) - res.matched_count
+        if unmatched > 0:
+            log.logger.warning(
+                f"[DB] {unmatched} job update(s) matched no job, lease likely lost"
+            )
+        return res.modified_count
+
+    async def flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -1,14 +1,19 @@
+import asyncio
+import io
 import json
-import os
 
 from aiohttp import ClientSession
 from common import log
-from urllib.parse import urlencode
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE_URL
+from config import (
+    PHOTO_DOWNLOAD_CONCURRENCY,
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_API_BASE_URL,
+)
 from database.dbutils import dbutils
 from typing import Optional, Any, Dict, Tuple
 from database import mongo
-from teleapi.requests import RequestResponse, request
+from teleapi import filepaths, photocache, ratelimit, session, transfers
+from teleapi.requests import RequestResponse, dumps, request
 
 
 async def get_bot_details(
@@ -30,28 +35,77 @@ async def send_media_group(
     user_bot_token: str,
     message_thread_id: int,
 ) -> Tuple[RequestResponse, Optional[str]]:
-    media, files, err = await prepare_photos(http_session, photo_id, content)
+    """Sends the album by file_id, which only works if `user_bot_token` owns the
+    photos, see is_wrong_file_identifier and upload_media_group otherwise."""
+    media = [
+        {"type": "photo", "media": photo_id, "caption": content if i <= 0 else ""}
+        for i, photo_id in enumerate(photo_id.split(";"))
+    ]
+    payload = {
+        "chat_id": chat_id,
+        "media": media,
+    }
+    if message_thread_id is not None:
+        payload["reply_to_message_id"] = message_thread_id
+
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendMediaGroup"
+    await ratelimit.limiter.acquire(user_bot_token, chat_id)
+    resp = await request(http_session, endpoint, method="POST", payload=payload)
+    err = resp.error
+    if err:
+        log.logger.warning(f"[TELEGRAM API] send_media_group failed: {err}")
+    return resp, str(err) if err else None
+
+
+async def upload_media_group(
+    http_session: ClientSession,
+    chat_id: int,
+    photo_id: str,
+    content: str,
+    user_bot_token: str,
+    message_thread_id: int,
+) -> Tuple[RequestResponse, Optional[str]]:
+    media, files, err = await prepare_photos(
+        http_session, photo_id, content, user_bot_token
+    )
     if err is not None:
         return RequestResponse(error=err), err
 
-    query = {
+    payload = {
         "chat_id": chat_id,
         "media": media,
     }
     if message_thread_id is not None:
-        query["reply_to_message_id"] = message_thread_id
+        payload["reply_to_message_id"] = message_thread_id
 
-    query_string = urlencode(query)
-    endpoint = (
-        f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendMediaGroup?{query_string}"
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendMediaGroup"
+    await ratelimit.limiter.acquire(user_bot_token, chat_id)
+    resp = await request(
+        http_session, endpoint, method="POST", files=files, payload=payload
     )
-    resp = await request(http_session, endpoint, method="POST", files=files)
     err = resp.error
     if err:
-        log.logger.warning(f"[TELEGRAM API] send_media_group failed: {err}")
+        log.logger.warning(f"[TELEGRAM API] upload_media_group failed: {err}")
     return resp, str(err) if err else None
 
 
+def is_wrong_file_identifier(resp: RequestResponse) -> bool:
+    # file_ids are per bot, another bot's file_id is rejected with a 400
+    description = str(resp.json.get("description") or "").lower()
+    return resp.status == 400 and "file identifier" in description
+
+
+def get_photo_ids(resp: RequestResponse) -> str:
+    """The sending bot's own file_ids for the photos of a sent media group."""
+    photo_ids = []
+    for message in resp.json.get("result") or []:
+        sizes = message.get("photo") if isinstance(message, dict) else None
+        if not sizes or not sizes[-1].get("file_id"):
+            return ""
+        photo_ids.append(sizes[-1]["file_id"])
+    return ";".join(photo_ids)
+
+
 async def send_single_photo(
     http_session: ClientSession,
     chat_id: int,
@@ -60,18 +114,18 @@ async def send_single_photo(
     user_bot_token: str,
     message_thread_id: int,
 ) -> Tuple[RequestResponse, Optional[str]]:
-    query = {
+    payload = {
         "chat_id": chat_id,
         "photo": photo_id,
         "caption": content,
         "parse_mode": "html",
     }
     if message_thread_id is not None:
-        query["reply_to_message_id"] = message_thread_id
+        payload["reply_to_message_id"] = message_thread_id
 
-    query_string = urlencode(query)
-    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendPhoto?{query_string}"
-    resp = await request(http_session, endpoint)
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendPhoto"
+    await ratelimit.limiter.acquire(user_bot_token, chat_id)
+    resp = await request(http_session, endpoint, method="POST", payload=payload)
     err = resp.error
     if err:
         log.logger.warning(f"[TELEGRAM API] send_single_photo failed: {err}")
@@ -102,9 +156,16 @@ async def send_single_photo_local(
     if err is not None:
         return RequestResponse(), err
 
-    query_string = urlencode({"chat_id": chat_id, "caption": content})
-    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{new_token}/sendPhoto?{query_string}"
-    resp = await request(http_session, endpoint, method="POST", files={"photo": photo})
+    payload = {"chat_id": chat_id, "caption": content}
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{new_token}/sendPhoto"
+    await ratelimit.limiter.acquire(new_token, chat_id)
+    resp = await request(
+        http_session,
+        endpoint,
+        method="POST",
+        files={"photo": photo},
+        payload=payload,
+    )
     err = resp.error
     if err:
         log.logger.warning(f"[TELEGRAM API] send_single_photo_local failed: {err}")
@@ -129,12 +190,10 @@ async def send_poll(
         )
 
     endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendPoll"
-    parameters = {
+    payload = {
         "chat_id": chat_id,
         "question": poll_content.get("question"),
-        "options": json.dumps(
-            [option.get("text") for option in poll_content.get("options")]
-        ),
+        "options": [option.get("text") for option in poll_content.get("options")],
         "type": poll_content.get("type"),
         "is_anonymous": poll_content.get("is_anonymous"),
         "allows_multiple_answers": poll_content.get("allows_multiple_answers"),
@@ -145,9 +204,10 @@ async def send_poll(
         "close_date": poll_content.get("close_date"),
     }
     if message_thread_id is not None:
-        parameters["reply_to_message_id"] = message_thread_id
+        payload["reply_to_message_id"] = message_thread_id
 
-    resp = await request(http_session, endpoint, data=parameters)
+    await ratelimit.limiter.acquire(user_bot_token, chat_id)
+    resp = await request(http_session, endpoint, method="POST", payload=payload)
     err = resp.error
     if err:
         log.logger.warning(f"[TELEGRAM API] send_poll failed: {err}")
@@ -161,17 +221,17 @@ async def send_text(
     user_bot_token: str,
     message_thread_id: int,
 ) -> Tuple[RequestResponse, Optional[str]]:
-    query = {
+    payload = {
         "chat_id": chat_id,
         "text": content,
         "parse_mode": "html",
     }
     if message_thread_id is not None:
-        query["reply_to_message_id"] = message_thread_id
+        payload["reply_to_message_id"] = message_thread_id
 
-    query_string = urlencode(query)
-    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendMessage?{query_string}"
-    resp = await request(http_session, endpoint)
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/sendMessage"
+    await ratelimit.limiter.acquire(user_bot_token, chat_id)
+    resp = await request(http_session, endpoint, method="POST", payload=payload)
     err = resp.error
     if err:
         log.logger.warning(f"[TELEGRAM API] send_text failed: {err}")
@@ -189,11 +249,14 @@ async def delete_message(
     message_ids = str(previous_message_id).split(";")
     if len(message_ids) <= 0:
         return
+    endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/deleteMessage"
     last_ok = None
     for message_id in message_ids:
         try:
-            endpoint = f"{TELEGRAM_API_BASE_URL}/bot{user_bot_token}/deleteMessage?chat_id={chat_id}&message_id={message_id}"
-            response = await request(http_session, endpoint)
+            payload = {"chat_id": chat_id, "message_id": message_id}
+            response = await request(
+                http_session, endpoint, method="POST", payload=payload
+            )
             err = response.error
             if err:
                 log.logger.warning(f"[TELEGRAM API] delete_message failed: {err}")
@@ -211,23 +274,58 @@ async def delete_message(
 
 
 async def prepare_photos(
-    http_session: ClientSession, photo_id: str, content: str
+    http_session: ClientSession,
+    photo_id: str,
+    content: str,
+    user_bot_token: Optional[str] = None,
 ) -> Tuple[str, Dict[str, Any], Optional[str]]:
     photo_ids = photo_id.split(";")
-    media, files = [], {}
-    for i, photo_id in enumerate(photo_ids):
-        files, err = await download_photo(http_session, files, photo_id)
-        if err is not None:
-            return json.dumps(media), files, err
-
-        media.append(
-            {
-                "type": "photo",
-                "media": "attach://%s" % photo_id,
-                "caption": content if i <= 0 else "",
-            }
-        )
-    return json.dumps(media), files, None
+    semaphore = asyncio.Semaphore(PHOTO_DOWNLOAD_CONCURRENCY)
+
+    async def download(photo_id: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        async with semaphore:
+            files, err = await download_photo(http_session, {}, photo_id)
+            # albums can mix photos added through the main bot with file_ids the
+            # sending bot got back from an earlier upload
+            if err is not None and user_bot_token not in (None, TELEGRAM_BOT_TOKEN):
+                files, err = await download_photo(
+                    http_session, files, photo_id, user_bot_token
+                )
+            return files, err
+
+    tasks = [
+        asyncio.create_task(download(photo_id)) for photo_id in dict.fromkeys(photo_ids)
+    ]
+    err = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            _, err = await next_done
+            if err is not None:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # fail fast, photos that were already downloaded are closed and dropped
+    if err is not None:
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                for file_obj in task.result()[0].values():
+                    file_obj.close()
+        return "[]", {}, err
+
+    files = {}
+    for task in tasks:
+        files.update(task.result()[0])
+    media = [
+        {
+            "type": "photo",
+            "media": "attach://%s" % photo_id,
+            "caption": content if i <= 0 else "",
+        }
+        for i, photo_id in enumerate(photo_ids)
+    ]
+    return dumps(media), files, None
 
 
 async def download_photo(
@@ -236,51 +334,89 @@ async def download_photo(
     photo_id: str,
     bot_token: Optional[str] = TELEGRAM_BOT_TOKEN,
 ) -> Tuple[Dict[str, Any], Optional[str]]:
-    file_details_endpoint = (
-        f"{TELEGRAM_API_BASE_URL}/bot{bot_token}/getFile?file_id={photo_id}"
-    )
-    try:
-        file_details_response = await request(http_session, file_details_endpoint)
-        if file_details_response.status != 200:
-            err = f"Failed to get file details, bot_token = {bot_token}, photo_id = {photo_id}, status = {file_details_response.status}"
-            log.logger.warning(f"[TELEGRAM API] {err}")
+    key = (bot_token, photo_id)
+    content = photocache.cache.get(key)
+    if content is None:
+        content, err = await fetch_photo(http_session, photo_id, bot_token)
+        if err is not None:
             return files, err
+        photocache.cache.put(key, content)
 
-        result = file_details_response.json.get("result")
-        file_path = result.get("file_path") if isinstance(result, dict) else None
-        if not file_path:
-            err = f"Failed to resolve file_path, bot_token = {bot_token}, photo_id = {photo_id}"
-            log.logger.warning(f"[TELEGRAM API] {err}")
-            return files, err
+    # BytesIO shares the downloaded bytes until written to, nothing is copied
+    photo = io.BytesIO(content)
+    photo.name = photo_id
+    files[photo_id] = photo
+    return files, None
+
+
+async def fetch_photo(
+    http_session: ClientSession, photo_id: str, bot_token: Optional[str]
+) -> Tuple[Optional[bytes], Optional[str]]:
+    try:
+        file_path, err = await get_file_path(http_session, photo_id, bot_token)
+        if err is not None:
+            return None, err
 
         file_url = f"{TELEGRAM_API_BASE_URL}/file/bot{bot_token}/{file_path}"
-        file_response = await request(http_session, file_url)
+        file_response = await request(
+            http_session, file_url, timeout=session.DOWNLOAD_TIMEOUT
+        )
 
         if file_response.status != 200:
+            # the path may have expired early, resolve it again next time
+            filepaths.cache.invalidate((bot_token, photo_id))
             err = f"Failed to get file, bot_token = {bot_token}, photo_id = {photo_id}, status = {file_response.status}"
             log.logger.warning(f"[TELEGRAM API] {err}")
-            return files, err
+            return None, err
 
         content = file_response.content
         if content is None:
             err = f"Empty file content, bot_token = {bot_token}, photo_id = {photo_id}"
             log.logger.warning(f"[TELEGRAM API] {err}")
-            return files, err
-
-        open(photo_id, "wb").write(content)
-        files[photo_id] = open(photo_id, "rb")
-        os.remove(photo_id)
-        return files, None
+            return None, err
+        return content, None
 
     except Exception as e:
         log.logger.warning(
             f"[TELEGRAM API] download_photo failed: {type(e).__name__} - {e}"
         )
-        try:
-            os.remove(photo_id)
-        except Exception:
-            pass
-        return files, str(e)
+        return None, str(e)
+
+
+async def get_file_path(
+    http_session: ClientSession, photo_id: str, bot_token: Optional[str]
+) -> Tuple[Optional[str], Optional[str]]:
+    key = (bot_token, photo_id)
+    file_path = filepaths.cache.get(key)
+    if file_path == filepaths.INVALID:
+        err = f"Invalid file_id, bot_token = {bot_token}, photo_id = {photo_id}"
+        return None, err
+    if file_path is not None:
+        return file_path, None
+
+    file_details_endpoint = (
+        f"{TELEGRAM_API_BASE_URL}/bot{bot_token}/getFile?file_id={photo_id}"
+    )
+    file_details_response = await request(
+        http_session, file_details_endpoint, timeout=session.GET_FILE_TIMEOUT
+    )
+    if file_details_response.status != 200:
+        # 400s are for file_ids this bot can never get, unlike 429s and 5xx
+        if file_details_response.status == 400:
+            filepaths.cache.put(key, filepaths.INVALID)
+        err = f"Failed to get file details, bot_token = {bot_token}, photo_id = {photo_id}, status = {file_details_response.status}"
+        log.logger.warning(f"[TELEGRAM API] {err}")
+        return None, err
+
+    result = file_details_response.json.get("result")
+    file_path = result.get("file_path") if isinstance(result, dict) else None
+    if not file_path:
+        err = f"Failed to resolve file_path, bot_token = {bot_token}, photo_id = {photo_id}"
+        log.logger.warning(f"[TELEGRAM API] {err}")
+        return None, err
+
+    filepaths.cache.put(key, file_path)
+    return file_path, None
 
 
 async def transfer_photo_between_bots(
@@ -292,6 +428,18 @@ async def transfer_photo_between_bots(
     photo_id: str,
     job_id: str,
 ) -> Tuple[Optional[str], Optional[str]]:
+    if new_token is None:
+        new_token = TELEGRAM_BOT_TOKEN
+
+    # the same photo may have been moved to this bot before, by another job
+    new_photo_id = await transfers.find_transferred_photo_id(
+        db_service, photo_id, new_token
+    )
+    if new_photo_id is not None:
+        q = {"photo_id": new_photo_id}
+        await dbutils.update_entry_by_jobid(db_service, job_id, q)
+        return new_photo_id, None
+
     resp, err = await send_single_photo_local(
         http_session,
         new_token=new_token,
@@ -319,6 +467,9 @@ async def transfer_photo_between_bots(
         log.logger.warning("[TELEGRAM API] failed to parse new photo id from response")
         return None, "Failed to parse new photo id from response"
 
+    await transfers.save_transferred_photo_id(
+        db_service, photo_id, new_token, new_photo_id
+    )
     q = {"photo_id": new_photo_id}
     await dbutils.update_entry_by_jobid(db_service, job_id, q)
 
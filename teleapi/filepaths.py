@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import config
+
+Key = Tuple[Optional[str], str]  # (bot token, file_id)
+INVALID = ""  # cached file_path of file_ids getFile rejected
+
+
+class FilePathCache:
+    """getFile results by (bot token, file_id). Telegram keeps a file_path valid
+    for at least an hour, rejected file_ids are remembered for a shorter while."""
+
+    def __init__(
+        self,
+        ttl: float = config.FILE_PATH_TTL,
+        invalid_ttl: float = config.FILE_PATH_INVALID_TTL,
+        max_size: int = config.FILE_PATH_CACHE_SIZE,
+    ) -> None:
+        self.ttl = ttl
+        self.invalid_ttl = invalid_ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[Key, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: Key) -> Optional[str]:
+        """Returns the file_path, INVALID for rejected file_ids or None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, file_path = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return file_path
+
+    def put(self, key: Key, file_path: str) -> None:
+        ttl = self.ttl if file_path != INVALID else self.invalid_ttl
+        self.entries[key] = (time.monotonic() + ttl, file_path)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Key) -> None:
+        self.entries.pop(key, None)
+
+
+cache = FilePathCache()
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import config
+from common import log
+from prometheus_client import Counter, Gauge
+
+photo_cache_hits = Counter(
+    "photo_cache_hits", "Photo downloads served from the cache", ["tier"]
+)
+photo_cache_misses = Counter(
+    "photo_cache_misses", "Photo downloads that went to Telegram"
+)
+photo_cache_bytes = Gauge("photo_cache_bytes", "Bytes of photos cached", ["tier"])
+
+Key = Tuple[Optional[str], str]  # (bot token, file_id)
+SPILL_NAME_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PhotoCache:
+    """LRU cache of downloaded photos within a byte budget, evicted photos go to
+    `spill_dir` (with its own budget) if one is set instead of being dropped."""
+
+    def __init__(
+        self,
+        max_bytes: int = config.PHOTO_CACHE_MAX_BYTES,
+        spill_dir: Optional[str] = config.PHOTO_CACHE_SPILL_DIR,
+        spill_max_bytes: int = config.PHOTO_CACHE_SPILL_MAX_BYTES,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Key, bytes]" = OrderedDict()
+        self.size = 0
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.spilled: "OrderedDict[Key, int]" = OrderedDict()  # key -> file size
+        self.spill_size = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.clear_spill_dir()
+
+    def clear_spill_dir(self) -> None:
+        # files left by a previous process cannot be mapped back to their keys
+        for name in os.listdir(self.spill_dir):
+            if SPILL_NAME_RE.match(name):
+                os.remove(os.path.join(self.spill_dir, name))
+
+    def get(self, key: Key) -> Optional[bytes]:
+        content = self.entries.get(key)
+        if content is not None:
+            self.entries.move_to_end(key)
+            photo_cache_hits.labels("memory").inc()
+            return content
+
+        content = self.read_spilled(key)
+        if content is not None:
+            photo_cache_hits.labels("disk").inc()
+            self.put(key, content)
+            return content
+
+        photo_cache_misses.inc()
+        return None
+
+    def put(self, key: Key, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = content
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.spill(evicted_key, evicted)
+        photo_cache_bytes.labels("memory").set(self.size)
+
+    def get_spill_path(self, key: Key) -> str:
+        # hashed so bot tokens never end up in file names
+        name = hashlib.sha256(f"{key[0]}:{key[1]}".encode()).hexdigest()
+        return os.path.join(self.spill_dir or "", name)
+
+    def spill(self, key: Key, content: bytes) -> None:
+        if self.spill_dir is None or key in self.spilled:
+            return
+        if len(content) > self.spill_max_bytes:
+            return
+        try:
+            with open(self.get_spill_path(key), "wb") as f:
+                f.write(content)
+        except OSError as e:
+            log.logger.warning(
+                f"[TELEGRAM API] Failed to spill photo: {type(e).__name__} - {e}"
+            )
+            return
+        self.spilled[key] = len(content)
+        self.spill_size += len(content)
+        while self.spill_size > self.spill_max_bytes:
+            self.remove_spilled(next(iter(self.spilled)))
+        photo_cache_bytes.labels("disk").set(self.spill_size)
+
+    def read_spilled(self, key: Key) -> Optional[bytes]:
+        if key not in self.spilled:
+            return None
+        try:
+            with open(self.get_spill_path(key), "rb") as f:
+                content = f.read()
+        except OSError:
+            content = None
+        # promoted back to memory, or gone
+        self.remove_spilled(key)
+        photo_cache_bytes.labels("disk").set(self.spill_size)
+        return content
+
+    def remove_spilled(self, key: Key) -> None:
+        self.spill_size -= self.spilled.pop(key)
+        try:
+            os.remove(self.get_spill_path(key))
+        except OSError:
+            pass
+
+
+cache = PhotoCache()
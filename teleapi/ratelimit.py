@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+import config
+from prometheus_client import Counter, Histogram
+
+rate_limit_wait = Histogram(
+    "telegram_rate_limit_wait_seconds",
+    "Time sends spent waiting on the Telegram rate limiter",
+    buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60, float("inf")),
+)
+rate_limited_sends = Counter(
+    "telegram_rate_limited_sends", "Sends delayed by the Telegram rate limiter"
+)
+
+rate_limit_penalties = Counter(
+    "telegram_rate_limit_penalties", "429 responses that paused a bot's sends"
+)
+
+
+class TokenBucket:
+    """Token bucket kept as a theoretical arrival time (GCRA), so waiters never poll."""
+
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.interval = 1 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.tat = 0.0
+
+    def earliest(self, now: float) -> float:
+        return max(now, self.tat - self.tolerance)
+
+    def book(self, at: float) -> None:
+        self.tat = max(self.tat, at) + self.interval
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now
+
+
+class RateLimiter:
+    """Spaces out sends per bot token, per chat and per group chat."""
+
+    def __init__(self) -> None:
+        self.buckets: Dict[Tuple[str, Any], TokenBucket] = {}
+
+    def get_bucket(self, key: Tuple[str, Any], rate: float, burst: int) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def get_bot_bucket(self, bot_token: str) -> TokenBucket:
+        return self.get_bucket(
+            ("bot", bot_token), config.BOT_RATE_LIMIT, config.BOT_RATE_BURST
+        )
+
+    def get_chat_buckets(self, bot_token: str, chat_id: Any) -> List[TokenBucket]:
+        buckets = [
+            self.get_bucket(
+                ("chat", bot_token, str(chat_id)),
+                config.CHAT_RATE_LIMIT,
+                config.CHAT_RATE_BURST,
+            )
+        ]
+        # groups and channels have negative chat ids
+        if str(chat_id).startswith("-"):
+            buckets.append(
+                self.get_bucket(
+                    ("group", bot_token, str(chat_id)),
+                    config.GROUP_RATE_LIMIT,
+                    config.GROUP_RATE_BURST,
+                )
+            )
+        return buckets
+
+    def reserve(self, buckets: List[TokenBucket], now: float) -> float:
+        """Books the earliest send time all `buckets` allow, returns the delay."""
+        send_at = max(bucket.earliest(now) for bucket in buckets)
+        for bucket in buckets:
+            bucket.book(send_at)
+        return send_at - now
+
+    def penalize(self, bot_token: str, retry_after: float) -> None:
+        """No sends from `bot_token` for `retry_after` seconds, after a 429."""
+        bucket = self.get_bot_bucket(bot_token)
+        resume_at = time.monotonic() + retry_after
+        bucket.tat = max(bucket.tat, resume_at + bucket.tolerance)
+        rate_limit_penalties.inc()
+
+    def prune(self, now: float) -> None:
+        # an idle bucket is the same as a new one
+        self.buckets = {k: b for k, b in self.buckets.items() if not b.idle(now)}
+
+    async def acquire(self, bot_token: str, chat_id: Any) -> float:
+        now = time.monotonic()
+        if len(self.buckets) > config.RATE_LIMIT_MAX_BUCKETS:
+            self.prune(now)
+
+        # wait for the chat first and only then take a slot from the bot, so a
+        # slow chat does not hold on to bot capacity other chats could use
+        delay = self.reserve(self.get_chat_buckets(bot_token, chat_id), now)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        bot_delay = self.reserve([self.get_bot_bucket(bot_token)], time.monotonic())
+        if bot_delay > 0:
+            await asyncio.sleep(bot_delay)
+
+        delay += bot_delay
+        rate_limit_wait.observe(delay)
+        if delay > 0:
+            rate_limited_sends.inc()
+        return delay
+
+
+limiter = RateLimiter()
@@ -1,4 +1,6 @@
+import json
 from dataclasses import dataclass, field
+from functools import partial
 from typing import Any, Dict, Optional
 import aiohttp
 
@@ -14,30 +16,50 @@ class RequestResponse:
     json: Dict[str, Any] = field(default_factory=dict)
 
 
+# compact, and utf-8 text instead of \u escapes roughly halves non-latin messages
+dumps = partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
+
+def drop_none(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in payload.items() if v is not None}
+
+
+def form_value(value: Any) -> str:
+    return value if isinstance(value, str) else dumps(value)
+
+
 async def request(
     session: aiohttp.ClientSession,
     url,
     method="GET",
     files: Optional[Dict[str, Any]] = None,
+    payload: Optional[Dict[str, Any]] = None,
     **kwargs,
 ) -> RequestResponse:
     if files:
+        # uploads have to be multipart, the payload goes along as form fields
         form = aiohttp.FormData()
+        for key, value in drop_none(payload or {}).items():
+            form.add_field(key, form_value(value))
         for key, file_obj in files.items():
             form.add_field(key, file_obj, filename=getattr(file_obj, "name", key))
         kwargs["data"] = form
+    elif payload is not None:
+        kwargs["data"] = dumps(drop_none(payload)).encode()
+        kwargs["headers"] = {"Content-Type": "application/json"}
 
     try:
         async with session.request(method, url, **kwargs) as response:
             content_type = response.headers.get("Content-Type", "")
 
             json_body: Dict[str, Any] = {}
+            content = None
             if "application/json" in content_type:
                 parsed = await response.json()
                 if isinstance(parsed, dict):
                     json_body = parsed
-
-            content = await response.read()
+            else:
+                content = await response.read()
 
             return RequestResponse(
                 status=response.status,
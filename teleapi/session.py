@@ -0,0 +1,116 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+import config
+from prometheus_client import Counter, Gauge, Histogram
+from teleapi.requests import request
+
+pool_wait = Histogram(
+    "http_pool_wait_seconds",
+    "Time requests spent queued for a free connection",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, float("inf")),
+)
+pool_queued = Gauge("http_pool_queued", "Requests waiting for a free connection")
+requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests in flight")
+connections_created = Counter(
+    "http_connections_created", "New connections opened by the HTTP pool"
+)
+connections_reused = Counter(
+    "http_connections_reused", "Requests served on a kept-alive connection"
+)
+
+SEND_TIMEOUT = aiohttp.ClientTimeout(
+    total=config.SEND_TIMEOUT,
+    connect=config.HTTP_CONNECT_TIMEOUT,
+    sock_read=config.SEND_READ_TIMEOUT,
+)
+GET_FILE_TIMEOUT = aiohttp.ClientTimeout(
+    total=config.GET_FILE_TIMEOUT,
+    connect=config.HTTP_CONNECT_TIMEOUT,
+    sock_read=config.GET_FILE_READ_TIMEOUT,
+)
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(
+    total=config.DOWNLOAD_TIMEOUT,
+    connect=config.HTTP_CONNECT_TIMEOUT,
+    sock_read=config.DOWNLOAD_READ_TIMEOUT,
+)
+
+
+async def on_request_start(*_: Any) -> None:
+    requests_in_flight.inc()
+
+
+async def on_request_end(*_: Any) -> None:
+    requests_in_flight.dec()
+
+
+async def on_connection_queued_start(
+    _session: aiohttp.ClientSession, ctx: SimpleNamespace, _params: Any
+) -> None:
+    ctx.queued_at = time.monotonic()
+    pool_queued.inc()
+
+
+async def on_connection_queued_end(
+    _session: aiohttp.ClientSession, ctx: SimpleNamespace, _params: Any
+) -> None:
+    pool_queued.dec()
+    pool_wait.observe(time.monotonic() - ctx.queued_at)
+
+
+async def on_connection_create_end(*_: Any) -> None:
+    connections_created.inc()
+
+
+async def on_connection_reuseconn(*_: Any) -> None:
+    connections_reused.inc()
+
+
+def get_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_end)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
+async def warm_up(http_session: aiohttp.ClientSession, connections: int) -> int:
+    """Opens `connections` keep-alive connections to the Telegram API, resolving
+    DNS and doing the TLS handshakes before the first tick. Returns how many
+    requests got a response."""
+    responses = await asyncio.gather(
+        *(
+            request(
+                http_session,
+                config.TELEGRAM_API_BASE_URL,
+                method="HEAD",
+                allow_redirects=False,
+            )
+            for _ in range(connections)
+        )
+    )
+    return sum(resp.error is None for resp in responses)
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Shared session for the Telegram API, the connector is sized to the
+    scheduler's send concurrency so sends do not queue for a connection."""
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_POOL_SIZE,
+        limit_per_host=config.HTTP_POOL_SIZE_PER_HOST,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=SEND_TIMEOUT,
+        trace_configs=[get_trace_config()],
+    )
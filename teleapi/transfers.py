@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import config
+from database import mongo
+from database.dbutils import dbutils
+
+Key = Tuple[str, str]  # (source file_id, target bot id)
+
+
+class TransferCache:
+    """LRU of file_ids photos got when sent through another bot, in front of
+    the photo_transfers collection."""
+
+    def __init__(self, max_size: int = config.PHOTO_TRANSFER_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.entries: "OrderedDict[Key, str]" = OrderedDict()
+
+    def get(self, key: Key) -> Optional[str]:
+        file_id = self.entries.get(key)
+        if file_id is not None:
+            self.entries.move_to_end(key)
+        return file_id
+
+    def put(self, key: Key, file_id: str) -> None:
+        self.entries[key] = file_id
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def get_bot_id(bot_token: str) -> str:
+    # tokens look like "<bot id>:<secret>", file_ids belong to the bot not the token
+    return bot_token.split(":")[0]
+
+
+async def find_transferred_photo_id(
+    db_service: mongo.MongoService, photo_id: str, bot_token: str
+) -> Optional[str]:
+    key = (photo_id, get_bot_id(bot_token))
+    file_id = cache.get(key)
+    if file_id is None:
+        file_id = await dbutils.find_transferred_photo_id(db_service, *key)
+        if file_id is not None:
+            cache.put(key, file_id)
+    return file_id
+
+
+async def save_transferred_photo_id(
+    db_service: mongo.MongoService, photo_id: str, bot_token: str, file_id: str
+) -> None:
+    key = (photo_id, get_bot_id(bot_token))
+    cache.put(key, file_id)
+    await dbutils.save_transferred_photo_id(db_service, *key, file_id)
+
+
+cache = TransferCache()
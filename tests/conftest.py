@@ -16,5 +16,6 @@ def mongo_service():
     svc.user_data_collection = db[config.MONGODB_USER_DATA_COLLECTION]
     svc.bot_data_collection = db[config.MONGODB_BOT_DATA_COLLECTION]
     svc.user_whitelist_collection = db[config.MONGODB_USER_WHITELIST_COLLECTION]
+    svc.photo_transfer_collection = db[config.MONGODB_PHOTO_TRANSFER_COLLECTION]
 
     return svc
@@ -39,3 +39,17 @@ async def test_checkcron_valid(send_msg, simple_update):
         res = await decrypt_cron(mock_update(text="* * * * *"), simple_update)
     assert res == ConversationHandler.END
     send_msg.assert_called_once()
+
+
+@pytest.mark.asyncio
+@mock.patch("bot.replies.text")
+async def test_checkcron_not_schedulable(send_msg, simple_update):
+    # cron_descriptor understands 7 fields, the scheduler does not
+    with mock.patch(
+        "bot.convos.checkcron.get_description", return_value="every minute"
+    ):
+        res = await decrypt_cron(mock_update(text="* * * * * ? *"), simple_update)
+    assert res is None
+    send_msg.assert_called_once_with(
+        mock.ANY, replies.checkcron_invalid_message, reply_markup=replies.force_reply
+    )
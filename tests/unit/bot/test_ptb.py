@@ -86,21 +86,23 @@ class FakeInflux:
         self.closed = True
 
 
+async def noop_migrations(*_):
+    return None
+
+
 @pytest.mark.asyncio
 async def test_lifespan_webhook_path(monkeypatch):
     monkeypatch.setattr(ptb, "InfluxDBClient3", FakeInflux)
-    monkeypatch.setattr(
-        ptb,
-        "aiohttp",
-        SimpleNamespace(ClientSession=FakeSession, ClientTimeout=lambda total: None),
-    )
+    monkeypatch.setattr(ptb.session, "create_session", FakeSession)
     monkeypatch.setattr(
         ptb, "Application", SimpleNamespace(builder=lambda: FakeBuilder())
     )
     monkeypatch.setattr(
         ptb.mongo, "MongoService", lambda *_: SimpleNamespace(disconnect=lambda: None)
     )
+    monkeypatch.setattr(ptb.migrations, "run", noop_migrations)
     monkeypatch.setattr(ptb.config, "BOTHOST", "https://example.com")
+    monkeypatch.setattr(ptb.config, "RUN_MIGRATIONS_ON_STARTUP", True)
 
     app = FastAPI()
     async with ptb.lifespan(app):
@@ -108,3 +110,128 @@ async def test_lifespan_webhook_path(monkeypatch):
         assert app.state.ptb.bot.webhook_set == "https://example.com"
 
     assert app.state.ptb.shutdown_called is True
+
+
+@pytest.mark.asyncio
+async def test_lifespan_starts_and_stops_scheduler(monkeypatch):
+    events = []
+
+    class FakeScheduler:
+        def __init__(self, tick):
+            self.tick = tick
+
+        def start(self):
+            events.append("start")
+
+        async def stop(self):
+            events.append("stop")
+
+    async def tick(*_):
+        return 0
+
+    monkeypatch.setattr(ptb, "InfluxDBClient3", FakeInflux)
+    monkeypatch.setattr(ptb.session, "create_session", FakeSession)
+    monkeypatch.setattr(
+        ptb, "Application", SimpleNamespace(builder=lambda: FakeBuilder())
+    )
+    monkeypatch.setattr(
+        ptb.mongo, "MongoService", lambda *_: SimpleNamespace(disconnect=lambda: None)
+    )
+    monkeypatch.setattr(ptb, "TickScheduler", FakeScheduler)
+    monkeypatch.setattr(ptb.migrations, "run", noop_migrations)
+    monkeypatch.setattr(ptb.config, "BOTHOST", "https://example.com")
+    monkeypatch.setattr(ptb.config, "SCHEDULER_ENABLED", True)
+
+    app = FastAPI()
+    async with ptb.lifespan(app, tick=tick):
+        assert events == ["start"]
+
+    assert events == ["start", "stop"]
+
+
+@pytest.mark.asyncio
+async def test_lifespan_warns_when_scheduler_enabled_without_tick(monkeypatch):
+    warnings = []
+
+    monkeypatch.setattr(ptb, "InfluxDBClient3", FakeInflux)
+    monkeypatch.setattr(ptb.session, "create_session", FakeSession)
+    monkeypatch.setattr(
+        ptb, "Application", SimpleNamespace(builder=lambda: FakeBuilder())
+    )
+    monkeypatch.setattr(
+        ptb.mongo, "MongoService", lambda *_: SimpleNamespace(disconnect=lambda: None)
+    )
+    monkeypatch.setattr(ptb.migrations, "run", noop_migrations)
+    monkeypatch.setattr(ptb.log.logger, "warning", lambda msg: warnings.append(msg))
+    monkeypatch.setattr(ptb.config, "BOTHOST", "https://example.com")
+    monkeypatch.setattr(ptb.config, "SCHEDULER_ENABLED", True)
+
+    async with ptb.lifespan(FastAPI()):
+        pass
+
+    assert any("no tick" in warning for warning in warnings)
+
+
+@pytest.mark.asyncio
+async def test_lifespan_reports_ready_after_warm_up(monkeypatch):
+    app = FastAPI()
+    events = []
+
+    async def fake_warm_up(db_service, http_session):
+        assert app.state.ready is False
+        events.append("warm_up")
+
+    monkeypatch.setattr(ptb, "InfluxDBClient3", FakeInflux)
+    monkeypatch.setattr(ptb.session, "create_session", FakeSession)
+    monkeypatch.setattr(
+        ptb, "Application", SimpleNamespace(builder=lambda: FakeBuilder())
+    )
+    monkeypatch.setattr(
+        ptb.mongo, "MongoService", lambda *_: SimpleNamespace(disconnect=lambda: None)
+    )
+    monkeypatch.setattr(ptb, "warm_up", fake_warm_up)
+    monkeypatch.setattr(ptb.config, "BOTHOST", "https://example.com")
+    monkeypatch.setattr(ptb.config, "WARMUP_ON_STARTUP", True)
+
+    async with ptb.lifespan(app):
+        assert events == ["warm_up"]
+        assert app.state.ready is True
+
+    assert app.state.ready is False
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pings_mongo_and_opens_connections(monkeypatch):
+    calls = []
+
+    async def ping():
+        calls.append("ping")
+
+    async def fake_session_warm_up(http_session, connections):
+        calls.append(connections)
+        return connections
+
+    monkeypatch.setattr(ptb.session, "warm_up", fake_session_warm_up)
+    monkeypatch.setattr(ptb.config, "WARMUP_HTTP_CONNECTIONS", 3)
+
+    await ptb.warm_up(SimpleNamespace(ping=ping), None)
+
+    assert sorted(calls, key=str) == [3, "ping"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_logs_failed_ping(monkeypatch):
+    warnings = []
+
+    async def ping():
+        raise ptb.PyMongoError("down")
+
+    async def fake_session_warm_up(http_session, connections):
+        return 0
+
+    monkeypatch.setattr(ptb.session, "warm_up", fake_session_warm_up)
+    monkeypatch.setattr(ptb.log.logger, "warning", lambda msg: warnings.append(msg))
+
+    await ptb.warm_up(SimpleNamespace(ping=ping), None)
+
+    assert any("ping failed" in warning for warning in warnings)
@@ -4,6 +4,7 @@ import pytest
 
 from bot import replies
 from common.enums import ContentType
+from common.job import Job
 
 
 def test_keyboard_from_dict_pairs():
@@ -43,18 +44,21 @@ def test_format_exceed_limit_reply_variants():
 
 def test_format_deleted_job_message_includes_core_job_details():
     message = replies.format_deleted_job_message(
-        entry={
-            "jobname": "daily-report",
-            "chat_id": 123,
-            "channel_id": "",
-            "crontab": "0 9 * * *",
-            "content": "send status update",
-            "content_type": "text",
-            "photo_id": "",
-            "photo_group_id": "",
-            "message_thread_id": 77,
-            "option_delete_previous": True,
-        },
+        job=Job.from_entry(
+            {
+                "_id": 1,
+                "jobname": "daily-report",
+                "chat_id": 123,
+                "channel_id": "",
+                "crontab": "0 9 * * *",
+                "content": "send status update",
+                "content_type": "text",
+                "photo_id": "",
+                "photo_group_id": "",
+                "message_thread_id": 77,
+                "option_delete_previous": True,
+            }
+        ),
         retry_count=1,
         errors=[{"error": "Error 400: bad request", "timestamp": "now"}],
     )
@@ -71,13 +75,16 @@ def test_format_deleted_job_message_includes_core_job_details():
 
 def test_format_deleted_job_message_escapes_html_content():
     message = replies.format_deleted_job_message(
-        entry={
-            "jobname": "job",
-            "chat_id": 1,
-            "crontab": "* * * * *",
-            "content": "<b>danger</b>",
-            "content_type": "text",
-        },
+        job=Job.from_entry(
+            {
+                "_id": 1,
+                "jobname": "job",
+                "chat_id": 1,
+                "crontab": "* * * * *",
+                "content": "<b>danger</b>",
+                "content_type": "text",
+            }
+        ),
         retry_count=2,
         errors=[],
     )
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from common import concurrency
+from common.concurrency import AdaptiveConcurrency
+
+
+@pytest.fixture(autouse=True)
+def targets(monkeypatch):
+    monkeypatch.setattr(concurrency.config, "CONCURRENCY_LATENCY_TARGET", 1)
+    monkeypatch.setattr(concurrency.config, "CONCURRENCY_ERROR_TARGET", 0.1)
+    monkeypatch.setattr(concurrency.config, "CONCURRENCY_STATS_EVERY", 1)
+    monkeypatch.setattr(concurrency.config, "CONCURRENCY_DECREASE", 0.5)
+
+
+def test_healthy_sends_increase_additively():
+    limiter = AdaptiveConcurrency(initial=10, min_limit=1, max_limit=100)
+
+    for _ in range(10):
+        limiter.record(0.1, False)
+
+    assert limiter.width() == 10
+    limiter.record(0.1, False)
+    assert limiter.width() == 11
+
+
+def test_slow_sends_stop_increase():
+    limiter = AdaptiveConcurrency(initial=10, min_limit=1, max_limit=100)
+
+    for _ in range(50):
+        limiter.record(5, False)
+
+    assert limiter.width() == 10
+
+
+def test_overload_decreases_once_per_cooldown(monkeypatch):
+    clock = iter([100.0, 100.5, 102.0])
+    monkeypatch.setattr(
+        concurrency, "time", SimpleNamespace(monotonic=lambda: next(clock))
+    )
+    limiter = AdaptiveConcurrency(initial=40, min_limit=15, max_limit=100)
+
+    limiter.record(0.1, True)
+    assert limiter.width() == 20
+    limiter.record(0.1, True)  # within cooldown
+    assert limiter.width() == 20
+    limiter.record(0.1, True)
+    assert limiter.width() == 15
+
+
+@pytest.mark.asyncio
+async def test_limits_in_flight_and_wakes_waiters():
+    limiter = AdaptiveConcurrency(initial=2, min_limit=1, max_limit=10)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with limiter:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[job() for _ in range(6)])
+
+    assert peak == 2
+    assert limiter.in_flight == 0
+    assert len(limiter.waiters) == 0
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from croniter import croniter
+
+from common import cron
+
+
+@pytest.mark.parametrize(
+    "crontab",
+    [
+        "* * * * *",
+        "0 9 * * *",
+        "*/15 8-18 * * mon-fri",
+        "30 12 1,15 * *",
+        "0 0 13 * 5",  # day of month OR day of week
+        "5/10 * * jan,jul 0",
+        "0 22 * * 7",
+        "0 0 1-31 * 1",  # full day of month counts as *
+        "0 6 * * 0-7",
+    ],
+)
+@pytest.mark.parametrize(
+    "start",
+    [
+        datetime(2025, 1, 1, 0, 30, 15, tzinfo=timezone.utc),
+        datetime(2024, 2, 28, 23, 59, tzinfo=timezone(timedelta(hours=8))),
+        datetime(2025, 6, 1, 0, 30, tzinfo=ZoneInfo("Europe/London")),
+        datetime(2025, 3, 9, 1, 30, tzinfo=ZoneInfo("America/New_York")),
+    ],
+)
+def test_get_next_matches_croniter(crontab, start):
+    exp = croniter(crontab, start).get_next(datetime)
+    res = cron.get_next(crontab, start)
+    assert res == exp
+    assert res.utcoffset() == exp.utcoffset()
+
+
+@pytest.mark.parametrize(
+    "crontab, dt, exp",
+    [
+        ("0 9 * * *", datetime(2025, 1, 1, 9, 0), True),
+        ("0 9 * * *", datetime(2025, 1, 1, 9, 1), False),
+        ("0 0 13 * 5", datetime(2025, 6, 13, 0, 0), True),  # friday the 13th
+        ("0 0 13 * 5", datetime(2025, 6, 6, 0, 0), True),  # friday
+        ("0 0 13 * 5", datetime(2025, 6, 7, 0, 0), False),
+        ("0 0 * 2 5", datetime(2025, 6, 6, 0, 0), False),
+        ("* * * * sun", datetime(2025, 6, 8, 12, 0), True),
+        ("* * * * 7", datetime(2025, 6, 8, 12, 0), True),
+    ],
+)
+def test_matches(crontab, dt, exp):
+    assert cron.compile_cron(crontab).matches(dt) is exp
+
+
+@pytest.mark.parametrize(
+    "crontab", ["@daily", "0 0 L * *", "0 0 * * 5#2", "0 0 * * * *", "61 * * * *"]
+)
+def test_compile_cron_unsupported(crontab):
+    assert cron.compile_cron(crontab) is None
+
+
+def test_get_next_falls_back_to_croniter():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    res = cron.get_next("@daily", start)
+    assert res == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "crontab, exp",
+    [
+        ("0 9 * * *", True),
+        ("@weekly", True),
+        ("0 0 * * 5#2", True),
+        ("* * * * * ? *", False),
+        ("0 0 0 * *", False),
+        ("bad", False),
+    ],
+)
+def test_is_valid(crontab, exp):
+    assert cron.is_valid(crontab) is exp
@@ -0,0 +1,45 @@
+import dataclasses
+
+import pytest
+
+from common import job as job_module
+from common.job import Job
+
+
+def test_from_entry_parses_fields(monkeypatch):
+    monkeypatch.setattr(job_module.config, "TELEGRAM_BOT_TOKEN", "main")
+
+    job = Job.from_entry(
+        {
+            "_id": 1,
+            "chat_id": 10,
+            "channel_id": -100,
+            "photo_id": "a;b",
+            "photo_group_id": 5,
+            "previous_message_id": 7,
+            "errors": [{"error": "x"}],
+            "user_bot_token": None,
+        }
+    )
+
+    assert job.target_chat_id == -100
+    assert job.photo_ids == ("a", "b")
+    assert job.photo_id == "a;b"
+    assert job.photo_group_id == "5"
+    assert job.previous_message_ids == ("7",)
+    assert job.errors == ({"error": "x"},)
+    assert job.bot_token == "main"
+    assert job.content == ""
+    assert job.message_thread_id is None
+
+
+def test_from_entry_defaults_and_immutability():
+    job = Job.from_entry({"_id": 1, "chat_id": 10, "user_bot_token": "own"})
+
+    assert job.target_chat_id == 10
+    assert job.photo_ids == ()
+    assert job.previous_message_ids == ()
+    assert job.bot_token == "own"
+    assert not hasattr(job, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        job.content = "changed"
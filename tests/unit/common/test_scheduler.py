@@ -0,0 +1,79 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from common import scheduler as scheduler_module
+from common.scheduler import TickScheduler
+
+
+async def noop():
+    return None
+
+
+def test_next_boundary_aligns_to_interval():
+    s = TickScheduler(noop, interval=60)
+    assert s.next_boundary(120.0) == 180.0
+    assert s.next_boundary(179.9) == 180.0
+    assert s.next_boundary(180.1) == 240.0
+
+
+@pytest.mark.asyncio
+async def test_run_forever_skips_overlapping_ticks(monkeypatch):
+    started = []
+    release = asyncio.Event()
+
+    async def slow_tick():
+        started.append(1)
+        await release.wait()
+
+    # every call to time() lands on a later boundary
+    clock = itertools.count(0, 60)
+    monkeypatch.setattr(
+        scheduler_module, "time", SimpleNamespace(time=lambda: next(clock))
+    )
+
+    s = TickScheduler(slow_tick, interval=60, offset=0)
+    s.start()
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    # the first tick is still running, every later boundary was skipped
+    assert len(started) == 1
+
+    release.set()
+    await s.stop()
+    assert s.loop_task is None
+
+
+@pytest.mark.asyncio
+async def test_run_tick_logs_errors(monkeypatch):
+    errors = []
+
+    async def failing_tick():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(
+        scheduler_module.log.logger, "error", lambda msg: errors.append(msg)
+    )
+
+    s = TickScheduler(failing_tick)
+    await s.run_tick()
+
+    assert any("boom" in error for error in errors)
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_in_flight_tick():
+    done = []
+
+    async def tick():
+        await asyncio.sleep(0.01)
+        done.append(1)
+
+    s = TickScheduler(tick)
+    s.tick_task = asyncio.create_task(s.run_tick())
+    await s.stop()
+
+    assert done == [1]
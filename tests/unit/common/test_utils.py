@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 import pytest
 from common import utils
@@ -170,3 +170,63 @@ def test_calc_next_run_dst(
 def test_format_timezone(timezone_str, tz_offset, exp_format):
     res = utils.format_timezone(timezone_str, tz_offset)
     assert res == exp_format
+
+
+def test_ts_to_epoch_mins():
+    # 2012-12-11 08:00 at UTC+08:00 is midnight UTC
+    expected = int(datetime(2012, 12, 11, tzinfo=timezone.utc).timestamp() // 60)
+    assert utils.ts_to_epoch_mins("2012-12-11 08:00") == expected
+    assert utils.ts_to_epoch_mins("2012-12-11 08:00:59.123456") == expected
+    assert utils.ts_to_epoch_mins("") is None
+
+
+def test_calc_next_run_shares_result_within_minute(monkeypatch):
+    class FixedDateTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            fixed = datetime(2030, 1, 1, 0, 30, 15, tzinfo=timezone.utc)
+            return fixed.astimezone(tz)
+
+    monkeypatch.setattr(utils, "datetime", FixedDateTime)
+    monkeypatch.setattr(utils.config, "TZ_OFFSET", 8.0)
+    utils.calc_next_run_at.cache_clear()
+
+    first = utils.calc_next_run("0 9 * * *", "Asia/Singapore", 0)
+    second = utils.calc_next_run("0 9 * * *", "Asia/Singapore", 0)
+
+    assert first == second == ("2030-01-01 09:00", "2030-01-01 09:00")
+    info = utils.calc_next_run_at.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_get_timezone_is_cached():
+    assert utils.get_timezone("UTC", 8) is utils.get_timezone("UTC", 8)
+    assert utils.get_timezone("UTC", 8) == timezone(timedelta(hours=8))
+
+
+def test_calc_next_runs_matches_calc_next_run(monkeypatch):
+    class FixedDateTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            fixed = datetime(2031, 3, 30, 0, 59, 30, tzinfo=timezone.utc)
+            return fixed.astimezone(tz)
+
+    monkeypatch.setattr(utils, "datetime", FixedDateTime)
+    monkeypatch.setattr(utils.config, "TZ_OFFSET", 8.0)
+
+    jobs = [
+        ("0 9 * * *", "Asia/Singapore", 0),
+        ("*/20 0,12 * * *", "UTC", -5.5),
+        ("0 9 * * *", "Asia/Singapore", 0),
+        ("30 1 * * *", "Europe/London", 0),  # DST starts at 01:00 UTC that day
+        ("0 0 13 * 5", "America/New_York", 0),
+        ("bad", "UTC", 0),
+    ]
+
+    res = utils.calc_next_runs(jobs)
+
+    for (crontab, tz, offset), next_run in zip(jobs[:-1], res):
+        assert next_run == utils.calc_next_run(crontab, tz, offset)
+    assert res[0] == ("2031-03-30 09:00", "2031-03-30 09:00")
+    assert res[-1] is None
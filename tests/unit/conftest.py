@@ -2,6 +2,27 @@ from unittest import mock
 import pytest
 
 from telegram import Chat, Update, User, Message
+from teleapi import filepaths, photocache, ratelimit, transfers
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "limiter", ratelimit.RateLimiter())
+
+
+@pytest.fixture(autouse=True)
+def fresh_photo_cache(monkeypatch):
+    monkeypatch.setattr(photocache, "cache", photocache.PhotoCache(spill_dir=None))
+
+
+@pytest.fixture(autouse=True)
+def fresh_file_path_cache(monkeypatch):
+    monkeypatch.setattr(filepaths, "cache", filepaths.FilePathCache())
+
+
+@pytest.fixture(autouse=True)
+def fresh_transfer_cache(monkeypatch):
+    monkeypatch.setattr(transfers, "cache", transfers.TransferCache())
 
 
 @pytest.fixture
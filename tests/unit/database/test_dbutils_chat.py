@@ -1,4 +1,5 @@
 import pytest
+from database.dbutils import dbutils_chat
 from database.dbutils.dbutils_chat import find_groups_created_by
 
 
@@ -22,3 +23,33 @@ async def test_find_groups_created_by(mongo_service):
     assert len(res) == 2
     assert res[0]["chat_type"] == "group"
     assert res[1]["chat_type"] == "supergroup"
+
+
+@pytest.mark.asyncio
+async def test_find_chats_tz_by_chatids(mongo_service, mock_group, mock_channel):
+    await mongo_service.chat_data_collection.insert_many([mock_group, mock_channel])
+
+    res = await dbutils_chat.find_chats_tz_by_chatids(mongo_service, [1, "2", 1, ""])
+
+    assert set(res.keys()) == {1.0, 2.0}
+    assert res[1.0] == {"chat_id": 1, "tz_offset": 8, "utc_tz": "UTC"}
+
+
+@pytest.mark.asyncio
+async def test_update_chats_tz_by_type_updates_channel_jobs(
+    mongo_service, mock_channel
+):
+    await mongo_service.chat_data_collection.insert_one(mock_channel)
+    await mongo_service.main_collection.insert_many(
+        [
+            {"_id": 1, "chat_id": 1, "channel_id": 2, "removed_ts": ""},
+            {"_id": 2, "chat_id": 3, "channel_id": "", "removed_ts": ""},
+        ]
+    )
+
+    await dbutils_chat.update_chats_tz_by_type(mongo_service, 1, 2, "channel", "UTC")
+
+    job = await mongo_service.find_one_entry({"_id": 1})
+    assert (job["tz_offset"], job["utc_tz"]) == (2, "UTC")
+    job = await mongo_service.find_one_entry({"_id": 2})
+    assert "utc_tz" not in job
@@ -15,6 +15,9 @@ def mock_jobs():
             "created_ts": 2,
             "removed_ts": "",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "pending_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
         },
         {
             "_id": 2,
@@ -25,6 +28,9 @@ def mock_jobs():
             "crontab": "* * * * *",
             "removed_ts": "",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "pending_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
         },
         {
             "_id": 3,
@@ -34,6 +40,8 @@ def mock_jobs():
             "created_ts": 1,
             "removed_ts": "",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
             "pending_ts": "2012-12-10 23:59:00",
         },
         {
@@ -44,6 +52,9 @@ def mock_jobs():
             "created_ts": 1,
             "removed_ts": "2012-02-11 08:22:00",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "pending_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
         },
         {
             "_id": 5,
@@ -54,6 +65,8 @@ def mock_jobs():
             "paused_ts": "2012-02-11 08:22:00",
             "removed_ts": "",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "pending_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
             "errors": [],
         },
         {
@@ -64,6 +77,9 @@ def mock_jobs():
             "created_ts": 1,
             "removed_ts": "2012-02-11 08:22:00",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "pending_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
             "errors": [{"error": "Error 400", "timestamp": ""}],
         },
         {
@@ -74,6 +90,8 @@ def mock_jobs():
             "created_ts": 1,
             "removed_ts": "",
             "nextrun_ts": "2012-02-11 08:22:00",
+            "paused_ts": "",
+            "nextrun_min": utils.ts_to_epoch_mins("2012-02-11 08:22:00"),
             "errors": [],
             "pending_ts": "2012-12-11 00:00:10",
         },
@@ -127,18 +145,6 @@ async def test_find_entries_removed_between(mongo_service, mock_jobs):
     assert len(res) == 0
 
 
-@pytest.mark.asyncio
-@mock.patch("common.utils.now", mock.MagicMock(return_value="2012-12-11 00:00:00"))
-async def test_find_entries_by_nextrun(mongo_service, mock_jobs):
-    await mongo_service.main_collection.insert_many(mock_jobs)
-    res = await dbutils_job.find_entries_by_nextrun(
-        mongo_service, "2013-12-11 00:00:00"
-    )
-    ids = [entry["_id"] for entry in res]
-    assert set(ids) == set([1, 2, 3])
-    assert len(res) == 3
-
-
 @pytest.mark.asyncio
 async def test_find_entries_by_chatid(mongo_service, mock_jobs):
     await mongo_service.main_collection.insert_many(mock_jobs)
@@ -173,12 +179,45 @@ async def test_entry_exists(mongo_service, mock_jobs, chat_id, expected):
     assert res is expected
 
 
+def fake_now(offset=0):
+    return "2012-12-11 00:%02d:00" % (5 + offset)
+
+
+@pytest.mark.asyncio
+@mock.patch("common.utils.now", fake_now)
+async def test_claim_due_jobs(mongo_service, mock_jobs):
+    await mongo_service.main_collection.insert_many(mock_jobs)
+
+    claimed = await dbutils_job.claim_due_jobs(
+        mongo_service, "2013-12-11 00:00:00", "lease", limit=2
+    )
+    assert claimed == 3
+
+    res = [
+        entry
+        async for batch in dbutils_job.iter_entries_by_lease(mongo_service, "lease")
+        for entry in batch
+    ]
+    assert [entry["_id"] for entry in res] == [3, 1, 2]
+    res = await mongo_service.find_entries({"lease_token": "lease"})
+    assert all(entry["pending_ts"] == "2012-12-11 00:05:00" for entry in res)
+
+    # already claimed jobs are not claimed again
+    claimed = await dbutils_job.claim_due_jobs(
+        mongo_service, "2013-12-11 00:00:00", "other"
+    )
+    assert claimed == 0
+
+
 def test_make_due_jobs_query_pending_and_paused(monkeypatch):
-    monkeypatch.setattr(utils, "now", mock.MagicMock(return_value="ts"))
-    q = dbutils_job.make_due_jobs_query("ts")
-    assert "$or" in q
-    assert q["$or"][0]["paused_ts"] == ""
-    assert q["$or"][1]["paused_ts"]["$exists"] is False
+    monkeypatch.setattr(
+        utils, "now", mock.MagicMock(return_value="2012-12-11 00:00:00")
+    )
+    q = dbutils_job.make_due_jobs_query("2012-12-11 00:00")
+    assert "$or" not in q
+    assert q["paused_ts"] == ""
+    assert q["pending_ts"] == {"$lte": "2012-12-11 00:00:00"}
+    assert q["nextrun_min"] == {"$lte": utils.ts_to_epoch_mins("2012-12-11 00:00")}
 
 
 """
@@ -208,13 +247,31 @@ async def test_add_new_entry(mongo_service):
     assert res["previous_message_id"] == ""
     assert res["option_delete_previous"] == ""
     assert res["nextrun_ts"] == ""
+    assert res["nextrun_min"] is None
     assert res["user_nextrun_ts"] == ""
     assert res["removed_ts"] == ""
+    assert res["paused_ts"] == ""
+    assert res["pending_ts"] == ""
     assert res["remarks"] == ""
     assert res["user_bot_token"] is None
+    assert res["tz_offset"] is None
+    assert res["utc_tz"] is None
     assert res["errors"] == []
 
 
+@pytest.mark.asyncio
+async def test_update_entries_tz_by_chatid(mongo_service, mock_jobs):
+    await mongo_service.main_collection.insert_many(mock_jobs)
+
+    res = await dbutils_job.update_entries_tz_by_chatid(mongo_service, 1, 2, "UTC")
+    assert res.modified_count == 4
+
+    job = await mongo_service.find_one_entry({"_id": 1})
+    assert (job["tz_offset"], job["utc_tz"]) == (2, "UTC")
+    job = await mongo_service.find_one_entry({"_id": 4})
+    assert "utc_tz" not in job
+
+
 @pytest.mark.asyncio
 async def test_remove_entries_by_chat(mongo_service, mock_jobs):
     await mongo_service.main_collection.insert_many(mock_jobs)
@@ -234,3 +291,45 @@ async def test_update_entry_by_jobname(mongo_service, mock_jobs):
     res = await mongo_service.find_one_entry({"_id": 1})
     assert res is not None
     assert res["created_ts"] == 4
+
+
+@pytest.mark.asyncio
+async def test_iter_entries_by_lease_batches(mongo_service):
+    await mongo_service.main_collection.insert_many(
+        [
+            {"_id": i, "lease_token": "lease", "removed_ts": "", "created_ts": str(i)}
+            for i in range(5)
+        ]
+        + [{"_id": 5, "lease_token": "other", "removed_ts": "", "created_ts": "5"}]
+    )
+
+    batches = [
+        [entry["_id"] for entry in batch]
+        async for batch in dbutils_job.iter_entries_by_lease(
+            mongo_service, "lease", batch_size=2
+        )
+    ]
+
+    assert batches == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_iter_entries_by_lease_projects_send_fields(mongo_service):
+    await mongo_service.main_collection.insert_one(
+        {
+            "_id": 1,
+            "lease_token": "lease",
+            "removed_ts": "",
+            "created_ts": "2012-12-11 00:00:00",
+            "remarks": "not needed to send",
+            "last_updated_by": 2,
+            "content": "hello",
+        }
+    )
+
+    batches = [
+        batch
+        async for batch in dbutils_job.iter_entries_by_lease(mongo_service, "lease")
+    ]
+
+    assert batches == [[{"_id": 1, "lease_token": "lease", "content": "hello"}]]
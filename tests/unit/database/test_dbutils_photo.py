@@ -0,0 +1,32 @@
+import pytest
+from pymongo.errors import PyMongoError
+
+from database.dbutils import dbutils_photo
+
+
+@pytest.mark.asyncio
+async def test_save_and_find_transferred_photo_id(mongo_service):
+    assert (
+        await dbutils_photo.find_transferred_photo_id(mongo_service, "a", "1") is None
+    )
+
+    await dbutils_photo.save_transferred_photo_id(mongo_service, "a", "1", "x")
+    await dbutils_photo.save_transferred_photo_id(mongo_service, "a", "1", "y")
+
+    assert await dbutils_photo.find_transferred_photo_id(mongo_service, "a", "1") == "y"
+    assert (
+        await dbutils_photo.find_transferred_photo_id(mongo_service, "a", "2") is None
+    )
+    assert await mongo_service.photo_transfer_collection.count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_find_transferred_photo_id_handles_errors(monkeypatch, mongo_service):
+    async def boom(*_):
+        raise PyMongoError("down")
+
+    monkeypatch.setattr(mongo_service, "find_one_photo_transfer", boom)
+
+    assert (
+        await dbutils_photo.find_transferred_photo_id(mongo_service, "a", "1") is None
+    )
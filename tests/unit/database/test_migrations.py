@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+import pytest
+
+from common import utils
+from database import migrations
+
+# mongomock's bulk_write rejects pymongo 4's UpdateOne, so record the operations
+# with a stand-in and apply them through update_one
+FakeUpdateOne = namedtuple("FakeUpdateOne", ["filter", "update"])
+FakeUpdateMany = namedtuple("FakeUpdateMany", ["filter", "update"])
+
+
+@pytest.fixture
+def bulk_mongo_service(mongo_service, monkeypatch):
+    async def bulk_update_entries(ops):
+        collection = mongo_service.main_collection
+        for op in ops:
+            if isinstance(op, FakeUpdateMany):
+                await collection.update_many(op.filter, op.update)
+            else:
+                await collection.update_one(op.filter, op.update)
+
+    monkeypatch.setattr(migrations, "UpdateOne", FakeUpdateOne)
+    monkeypatch.setattr(migrations, "UpdateMany", FakeUpdateMany)
+    mongo_service.bulk_update_entries = bulk_update_entries
+    return mongo_service
+
+
+@pytest.mark.asyncio
+async def test_backfill_nextrun_mins(bulk_mongo_service):
+    mongo_service = bulk_mongo_service
+    await mongo_service.main_collection.insert_many(
+        [
+            {"_id": 1, "nextrun_ts": "2012-02-11 08:22"},
+            {"_id": 2, "nextrun_ts": ""},
+            {"_id": 3, "nextrun_ts": "2012-02-11 08:22", "nextrun_min": 5},
+        ]
+    )
+
+    count = await migrations.backfill_nextrun_mins(mongo_service)
+    assert count == 2
+
+    one = await mongo_service.find_one_entry({"_id": 1})
+    assert one["nextrun_min"] == utils.ts_to_epoch_mins("2012-02-11 08:22")
+    two = await mongo_service.find_one_entry({"_id": 2})
+    assert two["nextrun_min"] is None
+    three = await mongo_service.find_one_entry({"_id": 3})
+    assert three["nextrun_min"] == 5
+
+    # idempotent
+    assert await migrations.backfill_nextrun_mins(mongo_service) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_creates_due_jobs_index(bulk_mongo_service):
+    mongo_service = bulk_mongo_service
+    await migrations.run(mongo_service)
+    indexes = await mongo_service.main_collection.index_information()
+    assert "due_jobs" in indexes
+
+
+@pytest.mark.asyncio
+async def test_normalize_job_defaults(mongo_service):
+    await mongo_service.main_collection.insert_many(
+        [
+            {"_id": 1},
+            {"_id": 2, "paused_ts": "ts", "pending_ts": None},
+            {"_id": 3, "paused_ts": "", "pending_ts": "ts"},
+        ]
+    )
+
+    await migrations.normalize_job_defaults(mongo_service)
+
+    one = await mongo_service.find_one_entry({"_id": 1})
+    assert one["paused_ts"] == "" and one["pending_ts"] == ""
+    two = await mongo_service.find_one_entry({"_id": 2})
+    assert two["paused_ts"] == "ts" and two["pending_ts"] == ""
+    three = await mongo_service.find_one_entry({"_id": 3})
+    assert three["pending_ts"] == "ts"
+
+
+@pytest.mark.asyncio
+async def test_backfill_job_timezones(bulk_mongo_service):
+    mongo_service = bulk_mongo_service
+    await mongo_service.chat_data_collection.insert_many(
+        [
+            {"chat_id": 1, "tz_offset": 8, "utc_tz": "UTC"},
+            {"chat_id": -100, "tz_offset": 2, "utc_tz": "Europe/Berlin"},
+        ]
+    )
+    await mongo_service.main_collection.insert_many(
+        [
+            {"_id": 1, "chat_id": 1, "channel_id": None},
+            {"_id": 2, "chat_id": 1, "channel_id": -100},
+            {"_id": 3, "chat_id": 1, "channel_id": "", "utc_tz": "Asia/Tokyo"},
+        ]
+    )
+
+    await migrations.backfill_job_timezones(mongo_service)
+
+    one = await mongo_service.find_one_entry({"_id": 1})
+    assert (one["tz_offset"], one["utc_tz"]) == (8, "UTC")
+    two = await mongo_service.find_one_entry({"_id": 2})
+    assert (two["tz_offset"], two["utc_tz"]) == (2, "Europe/Berlin")
+    three = await mongo_service.find_one_entry({"_id": 3})
+    assert three["utc_tz"] == "Asia/Tokyo"
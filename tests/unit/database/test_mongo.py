@@ -1,6 +1,7 @@
 from unittest import mock
 
 import pytest
+from pymongo import UpdateOne
 
 from database.mongo import MongoService
 
@@ -29,6 +30,15 @@ def test_get_collection():
     assert svc.get_collection("col") == "value"
 
 
+@pytest.mark.asyncio
+async def test_ping_runs_admin_command():
+    svc = MongoService.__new__(MongoService)
+    svc.client = mock.Mock()
+    svc.client.admin.command = mock.AsyncMock()
+    await svc.ping()
+    svc.client.admin.command.assert_awaited_once_with("ping")
+
+
 def test_disconnect_calls_client_close():
     svc = MongoService.__new__(MongoService)
     svc.client = mock.Mock()
@@ -43,6 +53,13 @@ async def test_find_entries_with_sort(mongo_service):
     assert [r["x"] for r in res] == [1, 2]
 
 
+@pytest.mark.asyncio
+async def test_find_entries_cursor_with_sort(mongo_service):
+    await mongo_service.main_collection.insert_many([{"x": 2}, {"x": 1}])
+    cursor = MongoService.find_entries_cursor(mongo_service, {}, [("x", 1)], 1)
+    assert [r["x"] async for r in cursor] == [1, 2]
+
+
 @pytest.mark.asyncio
 async def test_find_one_entry(mongo_service):
     await mongo_service.main_collection.insert_one({"a": 1})
@@ -147,3 +164,15 @@ async def test_find_one_whitelist(mongo_service):
     await mongo_service.user_whitelist_collection.insert_one({"user_id": 1})
     res = await MongoService.find_one_whitelist(mongo_service, {"user_id": 1})
     assert res is not None
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_entries_is_unordered():
+    svc = MongoService.__new__(MongoService)
+    svc.main_collection = mock.Mock(bulk_write=mock.AsyncMock(return_value="res"))
+    ops = [UpdateOne({"_id": 1}, {"$set": {"a": 1}})]
+
+    res = await MongoService.bulk_update_entries(svc, ops)
+
+    assert res == "res"
+    svc.main_collection.bulk_write.assert_awaited_once_with(ops, ordered=False)
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from database.sink import JobUpdateSink
+
+
+def make_db_service(matched_count=None):
+    async def bulk_update_entries(ops):
+        matched = len(ops) if matched_count is None else matched_count
+        return SimpleNamespace(matched_count=matched, modified_count=matched)
+
+    return SimpleNamespace(
+        bulk_update_entries=mock.AsyncMock(wraps=bulk_update_entries)
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_flushes_when_batch_is_full():
+    db_service = make_db_service()
+    sink = JobUpdateSink(db_service, batch_size=2, flush_interval=60)
+
+    await sink.add(1, {"a": 1}, q={"lease_token": "lease"})
+    db_service.bulk_update_entries.assert_not_awaited()
+
+    await sink.add(2, {"a": 2})
+    db_service.bulk_update_entries.assert_awaited_once()
+    ops = db_service.bulk_update_entries.await_args.args[0]
+    assert len(ops) == 2
+    assert sink.ops == []
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_remaining_updates():
+    db_service = make_db_service()
+    sink = JobUpdateSink(db_service, batch_size=10, flush_interval=60)
+    sink.start()
+
+    await sink.add(1, {"a": 1})
+    await sink.close()
+
+    db_service.bulk_update_entries.assert_awaited_once()
+    assert sink.timer_task is None
+
+
+@pytest.mark.asyncio
+async def test_flush_logs_unmatched_updates(monkeypatch):
+    warnings = []
+    db_service = make_db_service(matched_count=0)
+    sink = JobUpdateSink(db_service, batch_size=10, flush_interval=60)
+    monkeypatch.setattr(
+        "database.sink.log.logger.warning", lambda msg: warnings.append(msg)
+    )
+
+    await sink.add(1, {"a": 1})
+    await sink.flush()
+
+    assert any("lease likely lost" in warning for warning in warnings)
+
+
+@pytest.mark.asyncio
+async def test_flush_handles_db_errors():
+    db_service = SimpleNamespace(
+        bulk_update_entries=mock.AsyncMock(side_effect=PyMongoError("boom"))
+    )
+    sink = JobUpdateSink(db_service, batch_size=10, flush_interval=60)
+
+    await sink.add(1, {"a": 1})
+    assert await sink.flush() == 0
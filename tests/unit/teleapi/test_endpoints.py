@@ -1,3 +1,7 @@
+import asyncio
+import io
+import json
+
 import pytest
 
 from teleapi import endpoints
@@ -11,6 +15,7 @@ async def test_send_text_omits_reply_to_message_id_when_none(monkeypatch):
 
     async def fake_request(session, url, **kwargs):
         seen["url"] = url
+        seen["payload"] = kwargs.get("payload")
         return RequestResponse(status=200, json={"result": {"message_id": 1}})
 
     monkeypatch.setattr(endpoints, "request", fake_request)
@@ -24,7 +29,7 @@ async def test_send_text_omits_reply_to_message_id_when_none(monkeypatch):
     )
     assert err is None
 
-    assert "reply_to_message_id=" not in seen["url"]
+    assert "reply_to_message_id" not in seen["payload"]
 
 
 @pytest.mark.asyncio
@@ -33,6 +38,7 @@ async def test_send_single_photo_omits_reply_to_message_id_when_none(monkeypatch
 
     async def fake_request(session, url, **kwargs):
         seen["url"] = url
+        seen["payload"] = kwargs.get("payload")
         return RequestResponse(status=200, json={"result": {"message_id": 1}})
 
     monkeypatch.setattr(endpoints, "request", fake_request)
@@ -47,7 +53,7 @@ async def test_send_single_photo_omits_reply_to_message_id_when_none(monkeypatch
     )
     assert err is None
 
-    assert "reply_to_message_id=" not in seen["url"]
+    assert "reply_to_message_id" not in seen["payload"]
 
 
 @pytest.mark.asyncio
@@ -55,7 +61,7 @@ async def test_send_poll_omits_reply_to_message_id_when_none(monkeypatch):
     seen = {}
 
     async def fake_request(session, url, **kwargs):
-        seen["data"] = kwargs.get("data")
+        seen["payload"] = kwargs.get("payload")
         return RequestResponse(status=200, json={"result": {"message_id": 1}})
 
     monkeypatch.setattr(endpoints, "request", fake_request)
@@ -69,24 +75,26 @@ async def test_send_poll_omits_reply_to_message_id_when_none(monkeypatch):
     )
     assert err is None
 
-    assert "reply_to_message_id" not in seen["data"]
+    assert "reply_to_message_id" not in seen["payload"]
 
 
 @pytest.mark.asyncio
-async def test_send_media_group_omits_reply_to_message_id_when_none(monkeypatch):
+@pytest.mark.parametrize("send", ["send_media_group", "upload_media_group"])
+async def test_media_group_omits_reply_to_message_id_when_none(monkeypatch, send):
     seen = {}
 
-    async def fake_prepare_photos(session, photo_id, content):
+    async def fake_prepare_photos(session, photo_id, content, user_bot_token):
         return "[]", {}, None
 
     async def fake_request(session, url, **kwargs):
         seen["url"] = url
+        seen["payload"] = kwargs.get("payload")
         return RequestResponse(status=200, json={"result": []})
 
     monkeypatch.setattr(endpoints, "prepare_photos", fake_prepare_photos)
     monkeypatch.setattr(endpoints, "request", fake_request)
 
-    resp, err = await endpoints.send_media_group(
+    resp, err = await getattr(endpoints, send)(
         http_session=None,
         chat_id=1,
         photo_id="photo",
@@ -96,7 +104,134 @@ async def test_send_media_group_omits_reply_to_message_id_when_none(monkeypatch)
     )
     assert err is None
 
-    assert "reply_to_message_id=" not in seen["url"]
+    assert "reply_to_message_id" not in seen["payload"]
+
+
+@pytest.mark.asyncio
+async def test_send_media_group_sends_file_ids(monkeypatch):
+    seen = {}
+
+    async def fake_request(session, url, **kwargs):
+        seen.update(kwargs)
+        return RequestResponse(status=200, json={"result": []})
+
+    monkeypatch.setattr(endpoints, "request", fake_request)
+
+    await endpoints.send_media_group(None, 1, "a;b", "cap", "token", 7)
+
+    assert "files" not in seen
+    assert seen["payload"] == {
+        "chat_id": 1,
+        "media": [
+            {"type": "photo", "media": "a", "caption": "cap"},
+            {"type": "photo", "media": "b", "caption": ""},
+        ],
+        "reply_to_message_id": 7,
+    }
+
+
+@pytest.mark.parametrize(
+    "status, description, exp",
+    [
+        (400, "Bad Request: wrong file identifier/HTTP URL specified", True),
+        (400, "Bad Request: wrong remote file identifier specified", True),
+        (400, "Bad Request: chat not found", False),
+        (200, None, False),
+    ],
+)
+def test_is_wrong_file_identifier(status, description, exp):
+    resp = RequestResponse(status=status, json={"description": description})
+    assert endpoints.is_wrong_file_identifier(resp) is exp
+
+
+def test_get_photo_ids_takes_largest_size():
+    resp = RequestResponse(
+        status=200,
+        json={
+            "result": [
+                {"photo": [{"file_id": "a_small"}, {"file_id": "a"}]},
+                {"photo": [{"file_id": "b"}]},
+            ]
+        },
+    )
+    assert endpoints.get_photo_ids(resp) == "a;b"
+    assert endpoints.get_photo_ids(RequestResponse(json={"result": [{}]})) == ""
+
+
+@pytest.mark.asyncio
+async def test_prepare_photos_falls_back_to_sending_bot(monkeypatch):
+    tokens = []
+
+    async def fake_download_photo(session, files, photo_id, bot_token=None):
+        tokens.append(bot_token)
+        if bot_token is None:
+            return files, "not this bot's file"
+        files[photo_id] = photo_id
+        return files, None
+
+    monkeypatch.setattr(endpoints, "download_photo", fake_download_photo)
+
+    media, files, err = await endpoints.prepare_photos(None, "a", "cap", "own")
+
+    assert err is None
+    assert tokens == [None, "own"]
+    assert files == {"a": "a"}
+
+
+@pytest.mark.asyncio
+async def test_prepare_photos_downloads_concurrently_in_order(monkeypatch):
+    running, peak = 0, 0
+    delays = {"a": 0.03, "b": 0.01, "c": 0.02, "d": 0}
+
+    async def fake_download_photo(session, files, photo_id, bot_token=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delays[photo_id])
+        running -= 1
+        files[photo_id] = io.BytesIO(photo_id.encode())
+        return files, None
+
+    monkeypatch.setattr(endpoints, "download_photo", fake_download_photo)
+    monkeypatch.setattr(endpoints, "PHOTO_DOWNLOAD_CONCURRENCY", 2)
+
+    media, files, err = await endpoints.prepare_photos(None, "a;b;c;d", "cap")
+
+    assert err is None
+    assert peak == 2
+    assert [m["media"] for m in json.loads(media)] == [
+        "attach://a",
+        "attach://b",
+        "attach://c",
+        "attach://d",
+    ]
+    assert [m["caption"] for m in json.loads(media)] == ["cap", "", "", ""]
+    assert sorted(files) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_prepare_photos_fails_fast_and_closes_downloads(monkeypatch):
+    downloaded, finished = [], []
+
+    async def fake_download_photo(session, files, photo_id, bot_token=None):
+        if photo_id == "bad":
+            await asyncio.sleep(0.01)
+            return files, "boom"
+        if photo_id == "slow":
+            await asyncio.sleep(1)
+            finished.append(photo_id)
+        files[photo_id] = io.BytesIO(b"x")
+        downloaded.append(files[photo_id])
+        return files, None
+
+    monkeypatch.setattr(endpoints, "download_photo", fake_download_photo)
+
+    media, files, err = await endpoints.prepare_photos(None, "ok;bad;slow", "cap")
+
+    assert err == "boom"
+    assert files == {}
+    assert finished == []
+    assert [f.closed for f in downloaded] == [True]
 
 
 @pytest.mark.asyncio
@@ -114,7 +249,93 @@ async def test_download_photo_handles_non_200(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_transfer_photo_between_bots_success(monkeypatch):
+async def test_download_photo_keeps_photo_in_memory(monkeypatch, tmp_path):
+    async def fake_request(session, url, **kwargs):
+        if "getFile" in url:
+            return RequestResponse(
+                status=200, json={"result": {"file_path": "photos/1.jpg"}}
+            )
+        return RequestResponse(status=200, content=b"jpeg")
+
+    monkeypatch.setattr(endpoints, "request", fake_request)
+    monkeypatch.chdir(tmp_path)
+
+    files, err = await endpoints.download_photo(
+        http_session=None, files={}, photo_id="pid", bot_token="token"
+    )
+    assert err is None
+    assert files["pid"].name == "pid"
+    assert files["pid"].read() == b"jpeg"
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_download_photo_uses_cache_per_bot_token(monkeypatch):
+    urls = []
+
+    async def fake_request(session, url, **kwargs):
+        urls.append(url)
+        if "getFile" in url:
+            return RequestResponse(
+                status=200, json={"result": {"file_path": "photos/1.jpg"}}
+            )
+        return RequestResponse(status=200, content=b"jpeg")
+
+    monkeypatch.setattr(endpoints, "request", fake_request)
+
+    for _ in range(2):
+        files, err = await endpoints.download_photo(None, {}, "pid", "token")
+        assert err is None
+        assert files["pid"].read() == b"jpeg"
+    assert len(urls) == 2
+
+    await endpoints.download_photo(None, {}, "pid", "other")
+    assert len(urls) == 4
+
+
+@pytest.mark.asyncio
+async def test_fetch_photo_reuses_file_path(monkeypatch):
+    urls = []
+
+    async def fake_request(session, url, **kwargs):
+        urls.append(url)
+        if "getFile" in url:
+            return RequestResponse(
+                status=200, json={"result": {"file_path": "photos/1.jpg"}}
+            )
+        if len(urls) == 2:
+            return RequestResponse(status=404)
+        return RequestResponse(status=200, content=b"jpeg")
+
+    monkeypatch.setattr(endpoints, "request", fake_request)
+
+    # the first download fails, so the path is resolved again
+    assert (await endpoints.fetch_photo(None, "pid", "token"))[0] is None
+    assert await endpoints.fetch_photo(None, "pid", "token") == (b"jpeg", None)
+    assert await endpoints.fetch_photo(None, "pid", "token") == (b"jpeg", None)
+    assert sum("getFile" in url for url in urls) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, cached", [(400, True), (429, False), (502, False)])
+async def test_get_file_path_caches_rejected_file_ids(monkeypatch, status, cached):
+    calls = []
+
+    async def fake_request(session, url, **kwargs):
+        calls.append(url)
+        return RequestResponse(status=status, json={"description": "bad"})
+
+    monkeypatch.setattr(endpoints, "request", fake_request)
+
+    for _ in range(2):
+        file_path, err = await endpoints.get_file_path(None, "pid", "token")
+        assert file_path is None
+        assert err is not None
+    assert len(calls) == (1 if cached else 2)
+
+
+@pytest.mark.asyncio
+async def test_transfer_photo_between_bots_success(monkeypatch, mongo_service):
     async def fake_send_single_photo_local(*_args, **_kwargs):
         return (
             RequestResponse(
@@ -140,7 +361,7 @@ async def test_transfer_photo_between_bots_success(monkeypatch):
 
     new_photo_id, err = await endpoints.transfer_photo_between_bots(
         http_session=None,
-        db_service=None,
+        db_service=mongo_service,
         new_token="t",
         prev_token="p",
         chat_id=1,
@@ -149,10 +370,56 @@ async def test_transfer_photo_between_bots_success(monkeypatch):
     )
     assert err is None
     assert new_photo_id == "new"
+    stored = await mongo_service.find_one_photo_transfer({"source_file_id": "old"})
+    assert (stored["target_bot_id"], stored["file_id"]) == ("t", "new")
+
+
+@pytest.mark.asyncio
+async def test_transfer_photo_between_bots_is_memoized(monkeypatch, mongo_service):
+    sends, updates = [], []
+
+    async def fake_send_single_photo_local(*_args, **kwargs):
+        sends.append(kwargs["new_token"])
+        result = {"photo": [{"file_id": "new"}], "message_id": 1}
+        return RequestResponse(status=200, json={"result": result}), None
+
+    async def fake_update_entry_by_jobid(_db, job_id, q):
+        updates.append((job_id, q))
+
+    async def fake_delete_message(*_args, **_kwargs):
+        return True
+
+    monkeypatch.setattr(
+        endpoints, "send_single_photo_local", fake_send_single_photo_local
+    )
+    monkeypatch.setattr(
+        endpoints.dbutils, "update_entry_by_jobid", fake_update_entry_by_jobid
+    )
+    monkeypatch.setattr(endpoints, "delete_message", fake_delete_message)
+
+    async def transfer(new_token, job_id):
+        return await endpoints.transfer_photo_between_bots(
+            None, mongo_service, new_token, None, 1, "old", job_id
+        )
+
+    assert await transfer("123:secret", "job1") == ("new", None)
+    # same bot with a regenerated token, served from the front cache
+    assert await transfer("123:rotated", "job2") == ("new", None)
+    # after a restart, served from mongo
+    monkeypatch.setattr(
+        endpoints.transfers, "cache", endpoints.transfers.TransferCache()
+    )
+    assert await transfer("123:secret", "job3") == ("new", None)
+    # another bot needs its own transfer
+    assert await transfer("456:secret", "job4") == ("new", None)
+
+    assert sends == ["123:secret", "456:secret"]
+    assert [job_id for job_id, _ in updates] == ["job1", "job2", "job3", "job4"]
+    assert all(q == {"photo_id": "new"} for _, q in updates)
 
 
 @pytest.mark.asyncio
-async def test_transfer_photo_between_bots_error(monkeypatch):
+async def test_transfer_photo_between_bots_error(monkeypatch, mongo_service):
     async def fake_send_single_photo_local(*_args, **_kwargs):
         return RequestResponse(status=None), "boom"
 
@@ -162,7 +429,7 @@ async def test_transfer_photo_between_bots_error(monkeypatch):
 
     new_photo_id, err = await endpoints.transfer_photo_between_bots(
         http_session=None,
-        db_service=None,
+        db_service=mongo_service,
         new_token="t",
         prev_token="p",
         chat_id=1,
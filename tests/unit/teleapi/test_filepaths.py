@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+from teleapi import filepaths
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(filepaths, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_paths_expire_after_ttl(clock):
+    cache = filepaths.FilePathCache(ttl=60, invalid_ttl=10, max_size=10)
+    cache.put(("t", "a"), "photos/a.jpg")
+
+    clock.now += 59
+    assert cache.get(("t", "a")) == "photos/a.jpg"
+    clock.now += 1
+    assert cache.get(("t", "a")) is None
+    assert ("t", "a") not in cache.entries
+
+
+def test_invalid_file_ids_use_their_own_ttl(clock):
+    cache = filepaths.FilePathCache(ttl=60, invalid_ttl=10, max_size=10)
+    cache.put(("t", "a"), filepaths.INVALID)
+
+    assert cache.get(("t", "a")) == filepaths.INVALID
+    clock.now += 10
+    assert cache.get(("t", "a")) is None
+
+
+def test_evicts_least_recently_used(clock):
+    cache = filepaths.FilePathCache(ttl=60, invalid_ttl=10, max_size=2)
+    cache.put(("t", "a"), "a")
+    cache.put(("t", "b"), "b")
+    cache.get(("t", "a"))
+    cache.put(("t", "c"), "c")
+
+    assert cache.get(("t", "b")) is None
+    assert cache.get(("t", "a")) == "a"
+    assert cache.get(("t", "c")) == "c"
+
+
+def test_invalidate(clock):
+    cache = filepaths.FilePathCache()
+    cache.put(("t", "a"), "a")
+    cache.invalidate(("t", "a"))
+    cache.invalidate(("t", "missing"))
+    assert cache.get(("t", "a")) is None
@@ -0,0 +1,72 @@
+from teleapi.photocache import PhotoCache
+
+
+def test_evicts_least_recently_used_within_budget():
+    cache = PhotoCache(max_bytes=6, spill_dir=None)
+    cache.put(("t", "a"), b"aaa")
+    cache.put(("t", "b"), b"bbb")
+    assert cache.get(("t", "a")) == b"aaa"  # b is now the oldest
+
+    cache.put(("t", "c"), b"ccc")
+
+    assert cache.get(("t", "b")) is None
+    assert cache.get(("t", "a")) == b"aaa"
+    assert cache.get(("t", "c")) == b"ccc"
+    assert cache.size == 6
+
+
+def test_keys_are_per_bot_token():
+    cache = PhotoCache(max_bytes=10, spill_dir=None)
+    cache.put(("t1", "a"), b"a")
+    assert cache.get(("t2", "a")) is None
+
+
+def test_skips_photos_over_budget():
+    cache = PhotoCache(max_bytes=2, spill_dir=None)
+    cache.put(("t", "a"), b"aaa")
+    assert cache.get(("t", "a")) is None
+    assert cache.size == 0
+
+
+def test_replacing_a_key_keeps_size_right():
+    cache = PhotoCache(max_bytes=10, spill_dir=None)
+    cache.put(("t", "a"), b"aaa")
+    cache.put(("t", "a"), b"aa")
+    assert cache.size == 2
+
+
+def test_evicted_photos_spill_to_disk_and_come_back(tmp_path):
+    cache = PhotoCache(max_bytes=3, spill_dir=str(tmp_path), spill_max_bytes=100)
+    cache.put(("token", "a"), b"aaa")
+    cache.put(("token", "b"), b"bbb")
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    assert "token" not in files[0].name
+
+    assert cache.get(("token", "a")) == b"aaa"
+    # a is back in memory, b was spilled in its place
+    assert ("token", "a") in cache.entries
+    assert list(cache.spilled) == [("token", "b")]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_spill_dir_has_its_own_budget(tmp_path):
+    cache = PhotoCache(max_bytes=3, spill_dir=str(tmp_path), spill_max_bytes=6)
+    for name in "abcd":
+        cache.put(("t", name), name.encode() * 3)
+
+    # a was spilled first and dropped to make room for c
+    assert list(cache.spilled) == [("t", "b"), ("t", "c")]
+    assert cache.spill_size == 6
+    assert len(list(tmp_path.iterdir())) == 2
+    assert cache.get(("t", "a")) is None
+
+
+def test_clears_spilled_photos_from_previous_runs(tmp_path):
+    (tmp_path / ("0" * 64)).write_bytes(b"old")
+    (tmp_path / "keep.txt").write_bytes(b"keep")
+
+    PhotoCache(spill_dir=str(tmp_path))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["keep.txt"]
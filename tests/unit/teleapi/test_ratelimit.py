@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from teleapi import ratelimit
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0, slept=[])
+
+    async def fake_sleep(delay):
+        clock.slept.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", fake_sleep)
+    return clock
+
+
+def test_bucket_allows_burst_then_spaces_out():
+    limiter = ratelimit.RateLimiter()
+    bucket = ratelimit.TokenBucket(rate=10, burst=3)
+
+    delays = [limiter.reserve([bucket], 100.0) for _ in range(5)]
+
+    assert delays == pytest.approx([0, 0, 0, 0.1, 0.2])
+
+
+@pytest.mark.asyncio
+async def test_chat_bucket_is_per_bot_and_chat(clock):
+    limiter = ratelimit.RateLimiter()
+
+    assert await limiter.acquire("a", 1) == 0
+    assert await limiter.acquire("a", 1) == pytest.approx(1)
+    assert await limiter.acquire("a", 2) == 0
+    assert await limiter.acquire("b", 1) == 0
+    assert clock.slept == [pytest.approx(1)]
+
+
+@pytest.mark.asyncio
+async def test_group_bucket_limits_per_minute(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit.config, "CHAT_RATE_LIMIT", 100)
+    monkeypatch.setattr(ratelimit.config, "CHAT_RATE_BURST", 100)
+    limiter = ratelimit.RateLimiter()
+
+    delays = [await limiter.acquire("a", -100) for _ in range(21)]
+
+    assert delays[:20] == [0] * 20
+    assert delays[20] == pytest.approx(3)
+
+
+@pytest.mark.asyncio
+async def test_bot_bucket_is_shared_across_chats(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit.config, "BOT_RATE_LIMIT", 10)
+    monkeypatch.setattr(ratelimit.config, "BOT_RATE_BURST", 2)
+    limiter = ratelimit.RateLimiter()
+
+    delays = [await limiter.acquire("a", chat_id) for chat_id in range(4)]
+
+    assert delays == pytest.approx([0, 0, 0.1, 0.1])
+
+
+@pytest.mark.asyncio
+async def test_idle_buckets_are_pruned(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit.config, "RATE_LIMIT_MAX_BUCKETS", 2)
+    limiter = ratelimit.RateLimiter()
+    await limiter.acquire("a", 1)
+    await limiter.acquire("a", 2)
+
+    clock.now += 100
+    await limiter.acquire("a", 3)
+
+    assert set(limiter.buckets) == {("bot", "a"), ("chat", "a", "3")}
+
+
+@pytest.mark.asyncio
+async def test_penalize_pauses_bot(clock):
+    limiter = ratelimit.RateLimiter()
+
+    limiter.penalize("a", 5)
+
+    assert await limiter.acquire("a", 1) == pytest.approx(5)
+    assert await limiter.acquire("b", 1) == 0
@@ -69,3 +69,47 @@ async def test_request_includes_status_in_error():
     assert resp.error is not None
     assert "DummyError" in resp.error
     assert resp.status == 418
+
+
+class RecordingSession(DummySession):
+    def request(self, method, url, **kwargs):
+        self.kwargs = kwargs
+        return DummyRequestCtx()
+
+
+@pytest.mark.asyncio
+async def test_request_posts_compact_json_without_nones():
+    session = RecordingSession()
+
+    resp = await tele_requests.request(
+        session,
+        "http://example.com",
+        method="POST",
+        payload={"chat_id": 1, "text": "héllo <b>x</b>", "reply_to_message_id": None},
+    )
+
+    assert session.kwargs["data"] == '{"chat_id":1,"text":"héllo <b>x</b>"}'.encode()
+    assert session.kwargs["headers"] == {"Content-Type": "application/json"}
+    assert resp.json == {"ok": True}
+    assert resp.content is None  # json responses are not read twice
+
+
+@pytest.mark.asyncio
+async def test_request_sends_payload_as_form_fields_with_files():
+    file_obj = mock.Mock()
+    file_obj.name = "x"
+    session = RecordingSession()
+
+    await tele_requests.request(
+        session,
+        "http://example.com",
+        method="POST",
+        files={"photo": file_obj},
+        payload={"chat_id": 1, "media": [{"type": "photo"}], "caption": None},
+    )
+
+    fields = {field[0]["name"]: field[2] for field in session.kwargs["data"]._fields}
+    assert fields["chat_id"] == "1"
+    assert fields["media"] == '[{"type":"photo"}]'
+    assert "caption" not in fields
+    assert fields["photo"] is file_obj
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+from teleapi import session
+from teleapi.requests import RequestResponse
+
+
+def sample(metric, suffix=""):
+    samples = metric.collect()[0].samples
+    return next(s.value for s in samples if s.name.endswith(suffix))
+
+
+@pytest.mark.asyncio
+async def test_create_session_configures_pool(monkeypatch):
+    monkeypatch.setattr(session.config, "HTTP_POOL_SIZE", 42)
+    monkeypatch.setattr(session.config, "HTTP_POOL_SIZE_PER_HOST", 21)
+    monkeypatch.setattr(session.config, "HTTP_DNS_CACHE_TTL", 7)
+
+    http_session = session.create_session()
+    try:
+        connector = http_session.connector
+        assert connector.limit == 42
+        assert connector.limit_per_host == 21
+        assert connector.use_dns_cache
+        assert connector._cached_hosts._ttl == 7
+        assert http_session.timeout == session.SEND_TIMEOUT
+        assert len(http_session.trace_configs) == 1
+    finally:
+        await http_session.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_is_observed(monkeypatch):
+    clock = SimpleNamespace(monotonic=lambda: 10.0)
+    monkeypatch.setattr(session, "time", clock)
+    ctx = SimpleNamespace()
+    count = sample(session.pool_wait, "_count")
+    total = sample(session.pool_wait, "_sum")
+
+    await session.on_connection_queued_start(None, ctx, None)
+    assert sample(session.pool_queued) == 1
+
+    clock.monotonic = lambda: 10.5
+    await session.on_connection_queued_end(None, ctx, None)
+
+    assert sample(session.pool_queued) == 0
+    assert sample(session.pool_wait, "_count") == count + 1
+    assert sample(session.pool_wait, "_sum") == pytest.approx(total + 0.5)
+
+
+@pytest.mark.asyncio
+async def test_requests_in_flight_tracks_errors_too():
+    in_flight = sample(session.requests_in_flight)
+
+    await session.on_request_start(None, None, None)
+    await session.on_request_start(None, None, None)
+    assert sample(session.requests_in_flight) == in_flight + 2
+
+    await session.on_request_end(None, None, None)
+    await session.on_request_end(None, None, None)  # also wired to exceptions
+    assert sample(session.requests_in_flight) == in_flight
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_concurrent_connections(monkeypatch):
+    seen = []
+
+    async def fake_request(http_session, url, **kwargs):
+        seen.append((url, kwargs["method"]))
+        if len(seen) == 1:
+            return RequestResponse(error="boom")
+        return RequestResponse(status=302)
+
+    monkeypatch.setattr(session, "request", fake_request)
+    monkeypatch.setattr(session.config, "TELEGRAM_API_BASE_URL", "https://tg")
+
+    assert await session.warm_up(None, 3) == 2
+    assert seen == [("https://tg", "HEAD")] * 3
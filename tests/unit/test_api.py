@@ -4,13 +4,31 @@ from unittest.mock import AsyncMock
 import pytest
 
 import api
+from common.job import Job
 from teleapi.requests import RequestResponse
 
 
+class FakeSink:
+    def __init__(self):
+        self.updates = []
+
+    async def add(self, job_id, update, q={}):
+        assert q == {"lease_token": "lease"}
+        self.updates.append(update)
+
+
 def test_home():
     assert api.home() == "Hello world!"
 
 
+def test_readiness():
+    app = SimpleNamespace(state=SimpleNamespace())
+    assert api.readiness(SimpleNamespace(app=app)).status_code == 503
+
+    app.state.ready = True
+    assert api.readiness(SimpleNamespace(app=app)).status_code == 200
+
+
 def test_prom_endpoint():
     res = api.prom_endpoint()
     assert res.media_type == "text/plain"
@@ -18,10 +36,15 @@ def test_prom_endpoint():
 
 @pytest.mark.asyncio
 async def test_run_no_entries(monkeypatch):
-    async def fake_find_entries(*_):
-        return []
+    async def fake_claim_due_jobs(*_):
+        return 0
+
+    async def fake_iter_entries(*_):
+        return
+        yield
 
-    monkeypatch.setattr(api.dbutils, "find_entries_by_nextrun", fake_find_entries)
+    monkeypatch.setattr(api.dbutils, "claim_due_jobs", fake_claim_due_jobs)
+    monkeypatch.setattr(api.dbutils, "iter_entries_by_lease", fake_iter_entries)
     monkeypatch.setattr(api.config, "INFLUXDB_TOKEN", "")
 
     dummy_state = SimpleNamespace(mongo=None, http_session=None, influx=None)
@@ -32,24 +55,46 @@ async def test_run_no_entries(monkeypatch):
     assert res.status_code == 200
 
 
+@pytest.mark.asyncio
+async def test_run_returns_500_when_tick_fails(monkeypatch):
+    async def failing_tick(*_):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(api, "run_tick", failing_tick)
+
+    dummy_state = SimpleNamespace(mongo=None, http_session=None, influx=None)
+    dummy_request = SimpleNamespace(app=SimpleNamespace(state=dummy_state))
+
+    res = await api.run(dummy_request)
+    assert res.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_run_tick_no_entries(monkeypatch):
+    async def fake_claim_due_jobs(*_):
+        return 0
+
+    async def fake_iter_entries(*_):
+        return
+        yield
+
+    monkeypatch.setattr(api.dbutils, "claim_due_jobs", fake_claim_due_jobs)
+    monkeypatch.setattr(api.dbutils, "iter_entries_by_lease", fake_iter_entries)
+
+    assert await api.run_tick(None, None, None) == 0
+
+
 @pytest.mark.asyncio
 async def test_process_job_error_path(monkeypatch):
-    updates = []
+    sink = FakeSink()
     notify = AsyncMock()
 
-    async def fake_update_entry_by_jobname(db, entry, payload, q=None):
-        updates.append(payload)
-        return SimpleNamespace(modified_count=1)
-
     async def fake_send_message(*_):
-        return "", "boom"
+        return "", "boom", None, None
 
-    monkeypatch.setattr(
-        api.dbutils, "update_entry_by_jobname", fake_update_entry_by_jobname
-    )
     monkeypatch.setattr(api, "send_message", fake_send_message)
     monkeypatch.setattr(api, "notify_job_deleted", notify)
-    monkeypatch.setattr(api.utils, "now", lambda *_, **__: "now")
+    monkeypatch.setattr(api.utils, "now", lambda *_, **__: "2012-12-11 00:00:00.000000")
     monkeypatch.setattr(api.config, "RETRIES", 1)
 
     entry = {
@@ -67,12 +112,19 @@ async def test_process_job_error_path(monkeypatch):
         "errors": [],
         "option_delete_previous": "",
         "user_bot_token": "t",
+        "lease_token": "lease",
     }
 
-    await api.process_job(db_service=None, http_session=None, entry=entry)
+    await api.process_job(
+        db_service=None,
+        http_session=None,
+        sink=sink,
+        next_runs={},
+        job=Job.from_entry(entry),
+    )
 
-    assert len(updates) == 2
-    final_payload = updates[-1]
+    assert len(sink.updates) == 1
+    final_payload = sink.updates[-1]
     assert final_payload["previous_message_id"] == "123"
     assert len(final_payload["errors"]) == 1
     notify.assert_not_awaited()
@@ -80,22 +132,15 @@ async def test_process_job_error_path(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_process_job_notifies_creator_when_deleted(monkeypatch):
-    updates = []
+    sink = FakeSink()
     notify = AsyncMock()
 
-    async def fake_update_entry_by_jobname(db, entry, payload, q=None):
-        updates.append(payload)
-        return SimpleNamespace(modified_count=1)
-
     async def fake_send_message(*_):
-        return "", "boom"
+        return "", "boom", None, None
 
-    monkeypatch.setattr(
-        api.dbutils, "update_entry_by_jobname", fake_update_entry_by_jobname
-    )
     monkeypatch.setattr(api, "send_message", fake_send_message)
     monkeypatch.setattr(api, "notify_job_deleted", notify)
-    monkeypatch.setattr(api.utils, "now", lambda *_, **__: "now")
+    monkeypatch.setattr(api.utils, "now", lambda *_, **__: "2012-12-11 00:00:00.000000")
     monkeypatch.setattr(api.config, "RETRIES", 1)
 
     entry = {
@@ -115,16 +160,115 @@ async def test_process_job_notifies_creator_when_deleted(monkeypatch):
         "errors": [{"error": "earlier", "timestamp": "before"}],
         "option_delete_previous": "",
         "user_bot_token": "t",
+        "lease_token": "lease",
     }
 
-    await api.process_job(db_service=None, http_session=None, entry=entry)
+    await api.process_job(
+        db_service=None,
+        http_session=None,
+        sink=sink,
+        next_runs={},
+        job=Job.from_entry(entry),
+    )
 
-    assert len(updates) == 2
-    final_payload = updates[-1]
-    assert final_payload["removed_ts"] == "now"
+    assert len(sink.updates) == 1
+    final_payload = sink.updates[-1]
+    assert final_payload["removed_ts"] == "2012-12-11 00:00:00.000000"
     notify.assert_awaited_once()
 
 
+@pytest.mark.asyncio
+async def test_process_job_uses_batch_next_run(monkeypatch):
+    sink = FakeSink()
+
+    async def fake_send_message(*_):
+        return "5", None, None, None
+
+    def fail_calc_next_run(*_):
+        raise AssertionError("next run should come from the batch")
+
+    monkeypatch.setattr(api, "send_message", fake_send_message)
+    monkeypatch.setattr(api.utils, "calc_next_run", fail_calc_next_run)
+
+    entry = {
+        "_id": 1,
+        "chat_id": 1,
+        "crontab": "0 9 * * *",
+        "errors": [],
+        "lease_token": "lease",
+    }
+    next_runs = {1: ("2012-12-11 09:00", "2012-12-11 15:00")}
+
+    await api.process_job(
+        db_service=None,
+        http_session=None,
+        sink=sink,
+        next_runs=next_runs,
+        job=Job.from_entry(entry),
+    )
+
+    assert sink.updates[-1]["previous_message_id"] == "5"
+    assert sink.updates[-1]["user_nextrun_ts"] == "2012-12-11 09:00"
+    assert sink.updates[-1]["nextrun_ts"] == "2012-12-11 15:00"
+
+
+def test_get_job_timezone_prefers_job_then_chat():
+    chats = {-100.0: {"chat_id": -100, "tz_offset": 2, "utc_tz": "Europe/Berlin"}}
+    job = Job.from_entry(
+        {"_id": 1, "chat_id": 1, "utc_tz": "Asia/Tokyo", "tz_offset": 9}
+    )
+    legacy = Job.from_entry({"_id": 2, "chat_id": 1, "channel_id": -100})
+    unknown = Job.from_entry({"_id": 3, "chat_id": 2})
+
+    assert api.get_job_timezone(job, chats) == ("Asia/Tokyo", 9)
+    assert api.get_job_timezone(legacy, chats) == ("Europe/Berlin", 2)
+    assert api.get_job_timezone(unknown, chats) == (
+        None,
+        api.config.TZ_OFFSET,
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_tick_streams_batches_to_workers(monkeypatch):
+    entries = [
+        {"_id": i, "chat_id": i, "crontab": "0 9 * * *", "utc_tz": "UTC"}
+        for i in range(5)
+    ]
+    batches = []
+    seen = {}
+
+    async def fake_claim_due_jobs(*_):
+        return len(entries)
+
+    async def fake_iter_entries(*_):
+        yield entries[:3]
+        # the first batch is already being sent before the next one is read
+        await api.asyncio.sleep(0)
+        assert len(seen) > 0
+        yield entries[3:]
+
+    def fake_calc_next_runs(schedules):
+        batches.append(schedules)
+        return [("u", "d")] * len(schedules)
+
+    async def fake_process_job(db_service, http_session, sink, next_runs, job, _):
+        seen[job.id] = next_runs[job.id]
+
+    monkeypatch.setattr(api.dbutils, "claim_due_jobs", fake_claim_due_jobs)
+    monkeypatch.setattr(api.dbutils, "iter_entries_by_lease", fake_iter_entries)
+    monkeypatch.setattr(api.utils, "calc_next_runs", fake_calc_next_runs)
+    monkeypatch.setattr(api, "process_job", fake_process_job)
+    monkeypatch.setattr(api.config, "INFLUXDB_TOKEN", "")
+
+    monkeypatch.setattr(api.config, "TICK_WORKERS", 2)
+
+    assert await api.run_tick(None, None, None) == 5
+    # next runs are calculated once per batch
+    assert [len(schedules) for schedules in batches] == [3, 2]
+    assert batches[0] == [("0 9 * * *", "UTC", api.config.TZ_OFFSET)] * 3
+    assert seen == {i: ("u", "d") for i in range(5)}
+
+
 @pytest.mark.asyncio
 async def test_notify_job_deleted_logs_but_does_not_raise(monkeypatch):
     warnings = []
@@ -140,9 +284,16 @@ async def test_notify_job_deleted_logs_but_does_not_raise(monkeypatch):
 
     await api.notify_job_deleted(
         http_session=None,
-        entry={"_id": 1, "created_by": 7, "jobname": "job", "chat_id": 1},
+        job=Job.from_entry(
+            {
+                "_id": 1,
+                "created_by": 7,
+                "jobname": "job",
+                "chat_id": 1,
+                "user_bot_token": "token",
+            }
+        ),
         errors=[{"error": "boom", "timestamp": "now"}],
-        user_bot_token="token",
     )
 
     assert any(
@@ -167,17 +318,19 @@ async def test_notify_job_deleted_sends_dm_to_creator(monkeypatch):
 
     await api.notify_job_deleted(
         http_session=None,
-        entry={
-            "_id": 1,
-            "created_by": 42,
-            "jobname": "job",
-            "chat_id": 9,
-            "crontab": "* * * * *",
-            "content": "hello",
-            "content_type": "text",
-        },
+        job=Job.from_entry(
+            {
+                "_id": 1,
+                "created_by": 42,
+                "jobname": "job",
+                "chat_id": 9,
+                "crontab": "* * * * *",
+                "content": "hello",
+                "content_type": "text",
+                "user_bot_token": "token",
+            }
+        ),
         errors=[{"error": "boom", "timestamp": "now"}],
-        user_bot_token="token",
     )
 
     assert captured["chat_id"] == 42
@@ -198,9 +351,8 @@ async def test_notify_job_deleted_missing_creator_logs_warning(monkeypatch):
 
     await api.notify_job_deleted(
         http_session=None,
-        entry={"_id": 1, "jobname": "job", "chat_id": 1},
+        job=Job.from_entry({"_id": 1, "jobname": "job", "chat_id": 1}),
         errors=[],
-        user_bot_token="token",
     )
 
     send_text.assert_not_awaited()
@@ -214,17 +366,201 @@ async def test_send_message_non_200_returns_error(monkeypatch):
 
     monkeypatch.setattr(api.teleapi, "send_text", fake_send_text)
 
-    message_id, err = await api.send_message(
+    message_id, err, retry_after, photo_id = await api.send_message(
         http_session=None,
-        job_id=1,
-        chat_id=1,
-        content="c",
-        content_type="text",
-        photo_id="",
-        photo_group_id="",
-        user_bot_token="t",
-        message_thread_id=None,
+        job=Job.from_entry(
+            {"_id": 1, "chat_id": 1, "content": "c", "user_bot_token": "t"}
+        ),
     )
 
     assert message_id == ""
     assert "Error 400: bad" == err
+    assert retry_after is None
+
+
+@pytest.mark.asyncio
+async def test_send_message_429_penalizes_bot(monkeypatch):
+    penalized = []
+
+    async def fake_send_text(*_):
+        return (
+            RequestResponse(
+                status=429,
+                json={"description": "slow down", "parameters": {"retry_after": 7}},
+            ),
+            None,
+        )
+
+    monkeypatch.setattr(api.teleapi, "send_text", fake_send_text)
+    monkeypatch.setattr(
+        api.ratelimit.limiter, "penalize", lambda *args: penalized.append(args)
+    )
+
+    _, err, retry_after, _ = await api.send_message(
+        None, Job.from_entry({"_id": 1, "chat_id": 1, "user_bot_token": "t"})
+    )
+
+    assert err == "Error 429: slow down"
+    assert retry_after == 7
+    assert penalized == [("t", 7)]
+
+
+@pytest.mark.asyncio
+async def test_send_message_uploads_media_group_not_owned_by_bot(monkeypatch):
+    async def fake_send_media_group(*_):
+        return (
+            RequestResponse(
+                status=400,
+                json={"description": "Bad Request: wrong file identifier"},
+            ),
+            None,
+        )
+
+    async def fake_upload_media_group(*args):
+        assert args[2] == "a;b"
+        result = [
+            {"message_id": 1, "photo": [{"file_id": "own_a"}]},
+            {"message_id": 2, "photo": [{"file_id": "own_b"}]},
+        ]
+        return RequestResponse(status=200, json={"result": result}), None
+
+    monkeypatch.setattr(api.teleapi, "send_media_group", fake_send_media_group)
+    monkeypatch.setattr(api.teleapi, "upload_media_group", fake_upload_media_group)
+
+    job = Job.from_entry(
+        {"_id": 1, "chat_id": 1, "photo_id": "a;b", "photo_group_id": "g"}
+    )
+    message_id, err, retry_after, photo_id = await api.send_message(None, job)
+
+    assert err is None
+    assert message_id == "1;2"
+    assert photo_id == "own_a;own_b"
+
+
+@pytest.mark.asyncio
+async def test_send_message_media_group_by_file_id(monkeypatch):
+    upload = AsyncMock()
+
+    async def fake_send_media_group(*_):
+        result = [{"message_id": 1, "photo": [{"file_id": "a2"}]}]
+        return RequestResponse(status=200, json={"result": result}), None
+
+    monkeypatch.setattr(api.teleapi, "send_media_group", fake_send_media_group)
+    monkeypatch.setattr(api.teleapi, "upload_media_group", upload)
+
+    job = Job.from_entry(
+        {"_id": 1, "chat_id": 1, "photo_id": "a", "photo_group_id": "g"}
+    )
+    message_id, err, _, photo_id = await api.send_message(None, job)
+
+    assert (message_id, err, photo_id) == ("1", None, None)
+    upload.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_job_records_uploaded_photo_ids(monkeypatch):
+    sink = FakeSink()
+
+    async def fake_send_message(*_):
+        return "5", None, None, "own_a"
+
+    monkeypatch.setattr(api, "send_message", fake_send_message)
+
+    job = Job.from_entry(
+        {"_id": 1, "chat_id": 1, "crontab": "0 9 * * *", "lease_token": "lease"}
+    )
+    next_runs = {1: ("2012-12-11 09:00", "2012-12-11 15:00")}
+    await api.process_job(None, None, sink, next_runs, job)
+
+    assert sink.updates[-1]["photo_id"] == "own_a"
+
+
+def test_get_retry_after_transient_and_permanent():
+    assert api.get_retry_after(RequestResponse(status=502), "t") == 0
+    assert api.get_retry_after(RequestResponse(status=504), "t") == 0
+    assert api.get_retry_after(RequestResponse(status=403), "t") is None
+
+
+def retry_job():
+    return Job.from_entry(
+        {
+            "_id": 1,
+            "chat_id": 1,
+            "crontab": "* * * * *",
+            "previous_message_id": "123",
+            "nextrun_ts": "2012-12-11 00:00",
+            "errors": [],
+            "user_bot_token": "t",
+            "lease_token": "lease",
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_job_requests_retry_without_updating(monkeypatch):
+    sink = FakeSink()
+
+    async def fake_send_message(*_):
+        return "", "Error 429: slow down", 5, None
+
+    monkeypatch.setattr(api, "send_message", fake_send_message)
+
+    retry_in = await api.process_job(None, None, sink, {}, retry_job(), attempt=0)
+
+    assert retry_in == 5
+    assert sink.updates == []
+
+
+@pytest.mark.asyncio
+async def test_process_job_backs_off_transient_errors(monkeypatch):
+    async def fake_send_message(*_):
+        return "", "Error 502: bad gateway", 0, None
+
+    monkeypatch.setattr(api, "send_message", fake_send_message)
+    monkeypatch.setattr(api.config, "SEND_RETRY_BACKOFF", 1)
+
+    retry_in = await api.process_job(None, None, FakeSink(), {}, retry_job(), 2)
+
+    assert retry_in == 4
+
+
+@pytest.mark.asyncio
+async def test_process_job_rate_limited_does_not_burn_retry(monkeypatch):
+    sink = FakeSink()
+
+    async def fake_send_message(*_):
+        return "", "Error 429: slow down", 5, None
+
+    monkeypatch.setattr(api, "send_message", fake_send_message)
+    monkeypatch.setattr(api.utils, "now", lambda *_, **__: "2012-12-11 00:00:00.000000")
+    monkeypatch.setattr(api.config, "SEND_RETRY_ATTEMPTS", 3)
+
+    retry_in = await api.process_job(None, None, sink, {}, retry_job(), attempt=3)
+
+    assert retry_in is None
+    assert sink.updates[-1]["errors"] == []
+    assert sink.updates[-1]["nextrun_ts"] == "2012-12-11 00:00"
+
+
+@pytest.mark.asyncio
+async def test_bounded_process_job_retries_outside_limiter(monkeypatch):
+    limiter = api.AdaptiveConcurrency(initial=1, min_limit=1, max_limit=1)
+    attempts, slept = [], []
+
+    async def fake_process_job(db_service, http_session, sink, next_runs, job, attempt):
+        attempts.append(attempt)
+        return 2 if attempt < 2 else None
+
+    async def fake_sleep(delay):
+        assert limiter.in_flight == 0
+        slept.append(delay)
+
+    monkeypatch.setattr(api, "process_job", fake_process_job)
+    monkeypatch.setattr(api.asyncio, "sleep", fake_sleep)
+
+    job = Job.from_entry({"_id": 1})
+    await api.bounded_process_job(None, None, None, {}, job, limiter)
+
+    assert attempts == [0, 1, 2]
+    assert slept == [2, 2]
+    assert [overloaded for _, overloaded in limiter.samples] == [True, True, False]